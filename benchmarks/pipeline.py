@@ -0,0 +1,167 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+# the modules under test read their settings on import: point them at a scratch data tree
+WORKDIR = tempfile.mkdtemp(prefix = "expense-tracker-benchmark-")
+os.environ["MASTER_DIRECTORY"] = WORKDIR
+os.environ["CACHE_DIRECTORY"] = "" # memory cache only, so cold runs really parse
+for key, value in {"MY_NAME": "JANE DOE", "DBS": "111-22222-3", "OCBC": "1234", "IBKR": "U1234567",
+                   "Endowus": "E12345", "FD": "FD12345", "SRS": "SRS12345", "CPF": "S1234567A",
+                   "CDP": "0001-2345-6789"}.items():
+    os.environ.setdefault(key, value)
+for folder in ["uploads", "SG/DBS", "SG/OCBC", "SG/CDP", "SG/Endowus", "SG/CPF", "SG/FD or SRS", "SG/IBKR", "US"]:
+    os.makedirs(os.path.join(WORKDIR, "data", folder), exist_ok = True)
+
+BENCHMARK_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BENCHMARK_DIRECTORY, "..", "src"))
+
+from synthetic import write_statements, write_ledger
+from pdf_utilities import extract_text, extract_first_pages, text_cache
+from reader_registry import detect_statement, DETECT_PAGES
+from upload_utilities import process_upload
+from compile_utilities import LEDGER_ENGINE, compile_statements, category_table, balance_table
+
+
+def measure(stage, func, count = len, unit = "rows", repeat = 3, setup = None):
+    '''
+    FUNCTION to time a stage and record its peak memory
+    input:
+    - stage, name of the stage
+    - func, the stage to be run, without arguments
+    - count, function of the stage output giving the number of items processed (or a number)
+    - unit, name of the items processed
+    - repeat, number of timed runs
+    - setup, function run before every run (e.g. to clear caches)
+    output: dictionary of results
+    '''
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        output = func()
+        times.append(time.perf_counter() - start)
+
+    # separate run for memory, tracing slows the stage down
+    if setup:
+        setup()
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    items = count(output) if callable(count) else count
+    result = {"stage": stage, "best_s": min(times), "mean_s": sum(times)/len(times),
+              "items": items, "unit": unit, "throughput": items/min(times) if items and min(times) > 0 else None,
+              "peak_mb": peak/2**20}
+    print(f"{stage:<40} {result['best_s']*1000:>10.2f} ms {items or 0:>9} {unit:<6} {result['peak_mb']:>8.2f} MB")
+    return result
+
+
+def commit_hash():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd = BENCHMARK_DIRECTORY,
+                              capture_output = True, text = True, check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(npages, rows_per_page, years, transactions_per_month, repeat):
+    results = []
+
+    # statement readers over synthetic PDFs of every supported type
+    filepaths = write_statements(os.path.join(WORKDIR, "statements"), npages, rows_per_page)
+    for name, filepath in filepaths.items():
+        filename = os.path.basename(filepath)
+        with open(filepath, 'rb') as f:
+            bytes_data = f.read()
+        text = "".join(extract_first_pages(filepath, count = DETECT_PAGES))
+        reader = detect_statement(filename, text)
+        results.append(measure(f"detect_statement [{name}]", lambda: detect_statement(filename, text),
+                               count = 1, unit = "statements", repeat = repeat))
+
+        results.append(measure(f"extract_text [{name}]", lambda: extract_text(filepath),
+                               count = npages, unit = "pages", repeat = repeat, setup = text_cache.clear))
+        results.append(measure(f"get_transactions [{name}]", lambda: reader(filepath).get_transactions(),
+                               repeat = repeat, setup = text_cache.clear))
+
+        results.append(measure(f"process_upload [{name}]", lambda: process_upload(filename, bytes_data),
+                               count = npages, unit = "pages", repeat = repeat, setup = text_cache.clear))
+
+    # compiling and aggregating years of processed statements
+    rows = write_ledger(os.path.join(WORKDIR, "data", "SG"), years, transactions_per_month)
+    history = (date(1998, 10, 10), date.today())
+    last_year = (date.today() - timedelta(days = 365), date.today())
+
+    results.append(measure("compile_statements (first)", lambda: compile_statements("Singapore", history), repeat = 1))
+    results.append(measure("compile_statements", lambda: compile_statements("Singapore", history), repeat = repeat))
+    df = compile_statements("Singapore", history)
+    results.append(measure("category_table", lambda: category_table(df, last_year), count = df.shape[0], repeat = repeat))
+    results.append(measure("category_table (monthly)", lambda: category_table(df, history, freq = 'M'), count = df.shape[0], repeat = repeat))
+    results.append(measure("balance_table", lambda: balance_table(df, history), count = df.shape[0], repeat = repeat))
+
+    return {"commit": commit_hash(), "timestamp": datetime.now().isoformat(timespec = 'seconds'),
+            "python": platform.python_version(), "platform": platform.platform(),
+            "config": {"pages": npages, "rows_per_page": rows_per_page, "years": years,
+                       "transactions_per_month": transactions_per_month, "ledger_rows": rows,
+                       "ledger_engine": LEDGER_ENGINE, "repeat": repeat},
+            "results": results}
+
+
+def compare(report, baseline):
+    '''
+    FUNCTION to print the change in best time of every stage against an earlier report
+    '''
+    previous = {result["stage"]: result for result in baseline["results"]}
+    print(f"\nchange against {baseline['commit']} ({baseline['timestamp']})")
+    for result in report["results"]:
+        if result["stage"] in previous and previous[result["stage"]]["best_s"] > 0:
+            ratio = result["best_s"]/previous[result["stage"]]["best_s"]
+            flag = "  <-- slower" if ratio > 1.2 else ""
+            print(f"{result['stage']:<40} {ratio:>8.2f}x{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Benchmark statement parsing and ledger compilation on synthetic data.")
+    parser.add_argument("--pages", type = int, default = 10, help = "pages per synthetic statement")
+    parser.add_argument("--rows", type = int, default = 25, help = "transactions per page")
+    parser.add_argument("--years", type = int, default = 10, help = "years of processed statements")
+    parser.add_argument("--monthly", type = int, default = 100, help = "transactions per month and source")
+    parser.add_argument("--repeat", type = int, default = 3, help = "timed runs per stage")
+    parser.add_argument("--output", default = None, help = "results file (default: benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--compare", default = None, help = "earlier results file to compare against")
+    parser.add_argument("--keep", action = "store_true", help = "keep the synthetic data tree")
+    args = parser.parse_args()
+
+    try:
+        print(f"{'stage':<40} {'best':>13} {'items':>16} {'peak':>11}")
+        report = run(args.pages, args.rows, args.years, args.monthly, args.repeat)
+    finally:
+        if args.keep:
+            print(f"synthetic data kept in {WORKDIR}")
+        else:
+            shutil.rmtree(WORKDIR, ignore_errors = True)
+
+    output = args.output or os.path.join(BENCHMARK_DIRECTORY, "results",
+                                         f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok = True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent = 2)
+    print(f"results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
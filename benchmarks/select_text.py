@@ -0,0 +1,74 @@
+import os
+import sys
+import time
+import tempfile
+
+# pdf_utilities reads its settings on import
+os.environ.setdefault("MASTER_DIRECTORY", tempfile.mkdtemp())
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from pdf_utilities import invert_select_text, stream_select_text
+
+
+def recursive_invert_select_text(text, before, after):
+    '''
+    FUNCTION reproducing the previous recursive implementation of invert_select_text, for comparison
+    '''
+    if text.find(before) < 0 and text.find(after) < 0:
+        return text
+    elif text.find(before) == 0 and text.find(after) >= 0:
+        subtext = text[text.find(after) + len(after):]
+        return recursive_invert_select_text(subtext, before, after)
+    else:
+        subtext1 = text[:text.find(before)]
+        subtext2 = text[text.find(after) + len(after):]
+        return recursive_invert_select_text(subtext1 + subtext2, before, after)
+
+
+def synthetic_pages(npages, rows_per_page = 25):
+    '''
+    FUNCTION to create the pages of a DBS-style statement with a balance carried forward block at every page break
+    input:
+    - npages, number of pages
+    - rows_per_page, number of transactions per page
+    output: list of page contents as strings
+    '''
+    pages = []
+    for page in range(npages):
+        rows = "".join(f"{day % 28 + 1:02d}/01/2024\nGRAB *RIDE {page}-{day}\nREF {day:06d}\n12.50\n1,234.50\n"
+                       for day in range(rows_per_page))
+        header = "DBS Bank Ltd\nTransaction Details\nBalance Brought Forward\nSGD 1,234.50\n"
+        footer = "Balance Carried Forward\nSGD 1,234.50\nPage footer\n" if page < npages-1 else "\nTotal Balance Carried Forward\n"
+        pages.append(header + rows + footer)
+    return pages
+
+
+def timeit(func, repeat = 3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    sys.setrecursionlimit(10000)
+    start1, end1 = "Balance Brought Forward\n", "\nTotal Balance Carried Forward"
+    start2, end2 = "Balance Carried Forward\n", "\nBalance Brought Forward"
+    
+    print(f"{'pages':>6} {'recursive (s)':>14} {'linear (s)':>11} {'streaming (s)':>14}")
+    for npages in [50, 100, 200, 500]:
+        pages = synthetic_pages(npages)
+        text = "".join(pages)
+        subtext = text[text.find(start1)+len(start1):text.find(end1)]
+        
+        recursive = timeit(lambda: recursive_invert_select_text(subtext, start2, end2))
+        linear = timeit(lambda: invert_select_text(subtext, start2, end2))
+        streaming = timeit(lambda: "".join(stream_select_text(pages, start1, end1, start2, end2)))
+        assert recursive_invert_select_text(subtext, start2, end2) == invert_select_text(subtext, start2, end2)
+        print(f"{npages:>6} {recursive:>14.4f} {linear:>11.4f} {streaming:>14.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+
+BENCHMARK_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIRECTORY = os.path.abspath(os.path.join(BENCHMARK_DIRECTORY, "..", "src"))
+
+# each measurement runs in a fresh interpreter so nothing is imported yet
+IMPORT_SCRIPT = '''
+import sys, time
+sys.path.insert(0, {source!r})
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+'''
+RENDER_SCRIPT = '''
+import time
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file({main!r}, default_timeout = 300)
+start = time.perf_counter()
+app.run()
+first = time.perf_counter() - start
+start = time.perf_counter()
+app.run()
+print(first, time.perf_counter() - start, len(app.exception))
+'''
+
+
+def scratch_environment(workdir):
+    '''
+    FUNCTION to create a small data tree and the settings the app needs to start
+    input: workdir, the scratch MASTER_DIRECTORY
+    output: dictionary of environment variables
+    '''
+    env = dict(os.environ, MASTER_DIRECTORY = workdir, CACHE_DIRECTORY = "")
+    for key, value in {"MY_NAME": "JANE DOE", "DBS": "111-22222-3", "OCBC": "1234", "IBKR": "U1234567",
+                       "Endowus": "E12345", "FD": "FD12345", "SRS": "SRS12345", "CPF": "S1234567A",
+                       "CDP": "0001-2345-6789"}.items():
+        env.setdefault(key, value)
+    for folder in ["uploads", "SG/DBS", "SG/OCBC", "US"]:
+        os.makedirs(os.path.join(workdir, "data", folder), exist_ok = True)
+    subprocess.run([sys.executable, "-c", f"import sys; sys.path.insert(0, {BENCHMARK_DIRECTORY!r}); "
+                    f"from synthetic import write_ledger; write_ledger({os.path.join(workdir, 'data', 'SG')!r}, years = 2)"],
+                   env = env, check = True)
+    return env
+
+
+def run_python(script, env):
+    # the measurements are printed on the last line of output
+    output = subprocess.run([sys.executable, "-c", script], env = env, cwd = SOURCE_DIRECTORY,
+                            capture_output = True, text = True, check = True).stdout
+    return [float(value) for value in output.strip().splitlines()[-1].split()]
+
+
+def slowest_imports(module, env, top = 10):
+    '''
+    FUNCTION to list the imports with the largest cumulative time when importing a module
+    '''
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], env = env,
+                            cwd = SOURCE_DIRECTORY, capture_output = True, text = True, check = True)
+    imports = []
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line and "cumulative" not in line:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            depth = (len(name) - len(name.lstrip()) - 1)//2
+            if depth <= 1:
+                imports.append((int(cumulative_us)/1000, name.strip()))
+    return [{"module": name, "cumulative_ms": ms} for ms, name in sorted(imports, reverse = True)[:top]]
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values)//2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Benchmark cold start and first render of the Streamlit app.")
+    parser.add_argument("--repeat", type = int, default = 5, help = "fresh interpreters per measurement")
+    parser.add_argument("--output", default = None, help = "results file (default: benchmarks/results/startup-<time>-<commit>.json)")
+    parser.add_argument("--compare", default = None, help = "earlier results file to compare against")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix = "expense-tracker-startup-")
+    try:
+        env = scratch_environment(workdir)
+        results = dict()
+        for module in ["streamlit", "app", "main"]:
+            results[f"import {module}"] = median([run_python(IMPORT_SCRIPT.format(source = SOURCE_DIRECTORY, module = module), env)[0]
+                                                  for _ in range(args.repeat)])
+        renders = [run_python(RENDER_SCRIPT.format(main = os.path.join(SOURCE_DIRECTORY, "main.py")), env)
+                   for _ in range(args.repeat)]
+        results["first render"] = median([render[0] for render in renders])
+        results["rerun"] = median([render[1] for render in renders])
+        exceptions = max(int(render[2]) for render in renders)
+        imports = slowest_imports("app", env)
+    finally:
+        shutil.rmtree(workdir, ignore_errors = True)
+
+    for stage, seconds in results.items():
+        print(f"{stage:<20} {seconds*1000:>10.1f} ms")
+    if exceptions:
+        print(f"WARNING: {exceptions} exceptions raised while rendering")
+    print("\nslowest imports of app")
+    for entry in imports:
+        print(f"{entry['module']:<30} {entry['cumulative_ms']:>10.1f} ms")
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd = BENCHMARK_DIRECTORY,
+                                capture_output = True, text = True, check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = "unknown"
+    report = {"commit": commit, "timestamp": datetime.now().isoformat(timespec = 'seconds'),
+              "python": platform.python_version(), "platform": platform.platform(),
+              "repeat": args.repeat, "results": results, "slowest_imports": imports}
+    output = args.output or os.path.join(BENCHMARK_DIRECTORY, "results",
+                                         f"startup-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok = True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent = 2)
+    print(f"results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\nchange against {baseline['commit']} ({baseline['timestamp']})")
+        for stage, seconds in results.items():
+            if baseline["results"].get(stage):
+                print(f"{stage:<20} {seconds/baseline['results'][stage]:>8.2f}x")
+
+
+if __name__ == '__main__':
+    main()
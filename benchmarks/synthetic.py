@@ -0,0 +1,199 @@
+import os
+import random
+from datetime import date, timedelta
+import fitz
+import pandas as pd
+
+from decouple import config
+
+
+merchants = {
+    'Transport': ["GRAB *RIDE", "COMFORTDELGRO TAXI", "BUS/MRT 1234", "GOJEK"],
+    'Dining': ["STARBUCKS ORCHARD", "KOPITIAM BEDOK", "MCDONALD'S", "GRAB *FOOD"],
+    'Groceries': ["NTUC FAIRPRICE", "COLD STORAGE", "SHENG SIONG"],
+    'Entertainment': ["NETFLIX.COM", "SPOTIFY", "GOLDEN VILLAGE"],
+    'Personal': ["UNIQLO", "WATSONS", "GUARDIAN"],
+    'Taxes / Bills': ["SINGTEL BILL", "SP SERVICES"],
+}
+
+
+def write_pdf(pages, filepath):
+    '''
+    FUNCTION to write pages of text to a PDF file, one line of text per line of the page
+    input:
+    - pages, list of page contents as strings
+    - filepath, to pdf file
+    '''
+    doc = fitz.open()
+    for page_text in pages:
+        lines = page_text.split("\n")
+        # tall enough pages that no line is clipped
+        page = doc.new_page(width = 595, height = max(842, 20 + 10*len(lines)))
+        page.insert_text((36, 20), page_text, fontsize = 8, lineheight = 1.2)
+    doc.save(filepath)
+    doc.close()
+
+
+def transaction(rng):
+    category = rng.choice(list(merchants.keys()))
+    return rng.choice(merchants[category]), category, round(rng.uniform(1, 300), 2)
+
+
+def dbs_pages(npages, rows_per_page, seed = 0):
+    '''
+    FUNCTION to create the pages of a DBS-style account statement
+    '''
+    rng = random.Random(seed)
+    name, account = config('MY_NAME'), config('DBS')
+    balance, day = 10000.0, date(2024, 1, 1)
+    pages = []
+    for page in range(npages):
+        lines = ["DBS Bank Ltd", name, account, "Transaction Details", "Balance Brought Forward", f"SGD {balance:,.2f}"]
+        for row in range(rows_per_page):
+            description, category, amount = transaction(rng)
+            balance += amount if rng.random() < 0.2 else -amount
+            day += timedelta(days = rng.randint(0, 1))
+            lines += [day.strftime('%d/%m/%Y'), description, f"REF {rng.randint(0, 999999):06d}", f"{amount:,.2f}", f"{balance:,.2f}"]
+        if page < npages - 1:
+            lines += ["Balance Carried Forward", f"SGD {balance:,.2f}", f"Page {page+1} of {npages}"]
+        else:
+            lines += ["Total Balance Carried Forward", f"SGD {balance:,.2f}",
+                      "Total: SGD Equivalent", f"{balance:,.2f}", "Summary of Currency Breakdown"]
+        pages.append("\n".join(lines))
+    return pages
+
+
+def ocbc_pages(npages, rows_per_page, seed = 0):
+    '''
+    FUNCTION to create the pages of an OCBC-style credit card statement
+    '''
+    rng = random.Random(seed)
+    name, account = config('MY_NAME'), config('OCBC')
+    total = 0.0
+    pages = []
+    for page in range(npages):
+        lines = ["OCBC 90.N CARD", name, account]
+        if page == 0:
+            lines += ["TOTAL MINIMUM DUE", "15-12-2024", "LAST MONTH'S BALANCE"]
+        else:
+            lines += ["TRANSACTION DATE", "DESCRIPTION", "AMOUNT (SGD)"]
+        for row in range(rows_per_page):
+            description, category, amount = transaction(rng)
+            total += amount
+            lines += [f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}", f"{amount:,.2f}", f"{description} SINGAPORE SGP"]
+        if page < npages - 1:
+            lines += ["OCBC Bank", f"Page {page+1} of {npages}"]
+        else:
+            lines += [f"{total:,.2f}", "SUBTOTAL", "TOTAL AMOUNT DUE"]
+        pages.append("\n".join(lines))
+    return pages
+
+
+def cdp_pages(npages, rows_per_page, seed = 0):
+    '''
+    FUNCTION to create a CDP-style securities account statement, holdings listed in one table
+    '''
+    rng = random.Random(seed)
+    name, account = config('MY_NAME'), config('CDP')
+    lines = ["CDP", name, account, "Securities Account Statement", "SGD", "SGD"]
+    for row in range(npages*rows_per_page):
+        quantity = rng.randint(1, 100)*100
+        price = rng.uniform(0.1, 40)
+        lines += [f"STOCK {row:05d} LTD", "SB", f"{quantity:,d}", f"{quantity*price:,.2f}", f"{price:,.3f}", "-"]
+    lines += ["TOTAL: SGD", "END OF STATEMENT"]
+    # the table continues across pages without repeating headers
+    per_page = 6 + 6*rows_per_page
+    return ["\n".join(lines[ii:ii+per_page]) for ii in range(0, len(lines), per_page)]
+
+
+def endowus_pages(npages, rows_per_page, seed = 0):
+    '''
+    FUNCTION to create an Endowus-style investment statement, with filler pages of fund holdings
+    '''
+    rng = random.Random(seed)
+    name, account = config('MY_NAME'), config('Endowus')
+    pages = ["\n".join(["Endowus", name, account, "Investment Ending Balance (SGD)", "31 Dec 2024",
+                        f"{rng.uniform(1e4, 1e6):,.2f}", "Returns"])]
+    for page in range(1, npages):
+        pages.append("\n".join(f"Fund {page}-{row} {rng.uniform(1e2, 1e5):,.2f}" for row in range(rows_per_page)))
+    return pages
+
+
+def cpf_pages(npages, rows_per_page, seed = 0):
+    '''
+    FUNCTION to create a CPF-style yearly statement of account
+    '''
+    rng = random.Random(seed)
+    name, account = config('MY_NAME'), config('CPF')
+    day = date(2024, 1, 1)
+    pages = []
+    for page in range(npages):
+        lines = [name, account, "CPF Board", "Yearly Statement of Account for 2024", "MediSave", "Account ($)"]
+        for row in range(rows_per_page):
+            if page == 0 and row == 0:
+                lines += [day.strftime('%d %b'), "BAL", "10,000.00", "20,000.00", "30,000.00"]
+                continue
+            day = min(day + timedelta(days = rng.randint(0, 1)), date(2024, 12, 31))
+            lines += [day.strftime('%d %b'), "CON", "EMPLOYER", "REF",
+                      f"{rng.uniform(100, 2000):,.2f}", f"{rng.uniform(50, 500):,.2f}", f"{rng.uniform(50, 700):,.2f}"]
+        if page == npages - 1:
+            lines += ["See Appendix"]
+        pages.append("\n".join(lines))
+    return pages
+
+
+generators = {
+    'DBS': (dbs_pages, "DBS Statement.pdf"),
+    'OCBC': (ocbc_pages, "OCBC Statement.pdf"),
+    'CDP': (cdp_pages, "CDP Statement Dec 2024.pdf"),
+    'Endowus': (endowus_pages, "Endowus Statement.pdf"),
+    'CPF': (cpf_pages, "CPF Yearly Statement of Account 2024.pdf"),
+}
+
+
+def write_statements(directory, npages = 10, rows_per_page = 25, seed = 0):
+    '''
+    FUNCTION to write one synthetic statement PDF of every supported type
+    input:
+    - directory, where the PDFs are written
+    - npages, number of pages per statement
+    - rows_per_page, number of transactions per page
+    output: dictionary of statement type -> filepath
+    '''
+    os.makedirs(directory, exist_ok = True)
+    filepaths = dict()
+    for name, (generate, filename) in generators.items():
+        filepaths[name] = os.path.join(directory, filename)
+        write_pdf(generate(npages, rows_per_page, seed), filepaths[name])
+    return filepaths
+
+
+def write_ledger(directory, years = 10, transactions_per_month = 100, sources = ["DBS", "OCBC"], seed = 0):
+    '''
+    FUNCTION to write a data/<tag>/ tree of processed monthly .csv statements
+    input:
+    - directory, the data/<tag>/ folder
+    - years, years of history ending in the current month
+    - transactions_per_month, number of transactions in each monthly statement
+    - sources, the statement folders to be created
+    output: number of transactions written
+    '''
+    rng = random.Random(seed)
+    today = date.today()
+    months = pd.period_range(end = pd.Period(today, freq = 'M'), periods = 12*years, freq = 'M')
+    total = 0
+    for source in sources:
+        os.makedirs(os.path.join(directory, source), exist_ok = True)
+        balance = 10000.0
+        for month in months:
+            rows = []
+            for ii in range(transactions_per_month):
+                description, category, amount = transaction(rng)
+                amount = amount if rng.random() < 0.2 else -amount
+                balance += amount
+                day = month.start_time.date() + timedelta(days = rng.randint(0, month.days_in_month - 1))
+                rows.append([day, f"{description} {rng.randint(0, 9999)}", amount, round(balance, 2), category])
+            df = pd.DataFrame(rows, columns = ["Date", "Description", "Amount", "Balance", "Category"]).sort_values(by = "Date")
+            df.to_csv(os.path.join(directory, source, f"{source}-{month}.csv"))
+            total += len(df)
+    return total
@@ -1,5 +1,6 @@
 import os
 import sys
+import time
 from datetime import date
 import pandas as pd
 import streamlit as st
@@ -7,16 +8,34 @@ from annotated_text import annotated_text
 
 from decouple import config
 MASTER_DIRECTORY = config('MASTER_DIRECTORY')
+DIAGNOSTICS = config('DIAGNOSTICS', default = False, cast = bool)
 
 curr_dir = os.path.dirname(__file__)
 sys.path.append(curr_dir)
 
 from constants import expense_categories, tabs
 from format_utilities import horizontal_bar, vertical_bar
-from upload_utilities import clear_directory, completed
+from upload_utilities import completed
 from dtype_conversions import float_to_str, redact_text
-from compile_utilities import compile_statements, category_table, balance_table
-from frontend import uploader, tabulator, calculator, show_cards
+from compile_utilities import compile_statements, filter_period, select_transactions, category_table, balance_table, latest_balances
+from manifest_utilities import ledger_signature
+from rollup_utilities import load_rollup, rollup_category_table, rollup_balance_table
+from search_utilities import search_transactions
+from frontend import uploader, batch_uploader, tabulator, calculator, show_cards, diagnostics
+from job_utilities import POLL_INTERVAL
+
+
+@st.cache_data(max_entries = 8, show_spinner = False)
+def load_history(country, signature, today):
+    '''
+    FUNCTION to compile the full history of a country, cached across reruns until its statements change.
+    input:
+    - country, the subfolder to be compiled
+    - signature, the signature of the country's statements (part of the cache key)
+    - today, the current date (part of the cache key)
+    output: dataframe of all transactions
+    '''
+    return compile_statements(country, (date(1998,10,10), today))
 
 
 def MAIN():
@@ -24,6 +43,9 @@ def MAIN():
     tab_names = ["Upload"] + list(tabs.keys())
     if os.path.exists(f"{MASTER_DIRECTORY}/data/Calculator/"):
         tab_names +=  ["Calculator"]
+    # hidden unless DIAGNOSTICS is set
+    if DIAGNOSTICS:
+        tab_names += ["Diagnostics"]
     tab_content = st.tabs(tab_names)
     
     # initialize master_df (to be used in calculator page)
@@ -41,6 +63,10 @@ def MAIN():
         st.caption("Add monthly bank, credit card, or investment statements to the database.")
         uploader(border = True)
         
+        with st.expander("Batch Upload"):
+            st.caption("Backfill many statements at once. Statements are parsed in parallel and saved if no categories are needed.")
+            batch_uploader(border = False)
+        
         st.caption("OR Manually tabulate data.")
         tabulator(border = True)
     
@@ -63,10 +89,15 @@ def MAIN():
                                            max_value = date.today(),
                                            format = "YYYY/MM/DD",
                                            key = f"date_input{ii}")
-                    df = compile_statements(country, period)
+                    history = load_history(country, ledger_signature(country), date.today())
+                    df = filter_period(history, period) if history is not None else None
+                    rollup = load_rollup(country)
                 # display total spend & investment annotation
                 if not df is None and df.shape[0] > 0:
-                    table = category_table(df, period)
+                    # answer from monthly aggregates when the period covers whole months
+                    table = rollup_category_table(rollup, period)
+                    if table is None:
+                        table = category_table(df, period)
                     with summary_col:
                         st.write("""<h1> </h1>""", unsafe_allow_html = True)
                         spend = table.sum(axis = 1).iloc[0] - table['Investment'][0]
@@ -86,18 +117,29 @@ def MAIN():
                     chart = horizontal_bar(table, redact)
                     st.altair_chart(chart, use_container_width = True)
                     
-                    # dataframe of transactions, filterable by category
+                    # dataframe of transactions, searchable by description and filterable by category
                     with st.expander("View Details"):
+                        search = st.text_input("Search Description", key = f"{country}Search", placeholder = "e.g. grab")
                         modify = st.checkbox("Filter by Category")
                         if not modify:
-                            st.dataframe(df[["Date","Source","Description","Amount","Category"]]\
-                                         .loc[df["Category"].isin(expense_categories)]\
-                                         .reset_index(drop = True), use_container_width = True)
+                            filter_categories = expense_categories
                         else:
                             filter_categories = st.multiselect("↳ Select", expense_categories)
-                            st.dataframe(df[["Date","Source","Description","Amount","Category"]]\
-                                         .loc[df["Category"].isin(filter_categories)]\
-                                         .reset_index(drop = True), use_container_width = True)
+                        if search:
+                            details = search_transactions(country, search, period, filter_categories)
+                        else:
+                            details = select_transactions(country, df, period, filter_categories)
+                        st.dataframe(details[["Date","Source","Description","Amount","Category"]], use_container_width = True)
+                    
+                    # monthly spend per category over the selected period
+                    with st.expander("Spending Over Time"):
+                        monthly = rollup_category_table(rollup, period, freq = 'M')
+                        if monthly is None:
+                            monthly = category_table(df, period, freq = 'M')
+                        if redact:
+                            st.dataframe(monthly.applymap(lambda x: redact_text(float_to_str(x))), use_container_width = True)
+                        else:
+                            st.dataframe(monthly, use_container_width = True)
                     
             # details of active credit cards
             show_cards(country, redact)
@@ -105,12 +147,13 @@ def MAIN():
             # account balance
             with st.container(border = True):
                 # vertical bar of balance
-                df = compile_statements(country, (date(1998,10,10), date.today()))
+                df = history
                 
                 if not df is None and df.shape[0] > 0:
-                    series = balance_table(df, (date(1998,10,10), date.today()))
-                    pivot_df = pd.pivot_table(series, values = 'Balance', index = ['Date'],
-                                              columns = ['Source'], aggfunc = "mean")
+                    # month-end balances per source, forward filled
+                    pivot_df = rollup_balance_table(rollup)
+                    if pivot_df is None:
+                        pivot_df = balance_table(df, (date(1998,10,10), date.today()))
                     
                     chart = vertical_bar(pivot_df, redact)
                     st.altair_chart(chart, use_container_width = True)
@@ -121,18 +164,24 @@ def MAIN():
                         st.dataframe(pivot_df, use_container_width = True)
                         
                     # take last value in each column and add to master_df
-                    save_amounts = dict()
-                    for col in pivot_df.columns:
-                        save_amounts[col] = pivot_df[col].ffill().iloc[-1]
-                    save_df = pd.DataFrame.from_dict(save_amounts, orient = 'index', columns = ["Raw Value"])
+                    save_df = latest_balances(pivot_df).to_frame("Raw Value")
                     save_df["Currency"] = tabs[country]['currency']
-                    master_df = master_df.append(save_df)
+                    master_df = pd.concat([master_df, save_df])
     
     
     if "Calculator" in tab_names:
-        with tab_content[-1]:
+        with tab_content[tab_names.index("Calculator")]:
             calculator(master_df)
     
+    if "Diagnostics" in tab_names:
+        with tab_content[tab_names.index("Diagnostics")]:
+            diagnostics()
+    
+    # uploads still parsing in the background: the page is rendered, run again shortly to show their progress
+    if st.session_state.pop("JobsPending", False):
+        time.sleep(POLL_INTERVAL)
+        st.rerun()
+    
 
 
 
@@ -183,15 +232,15 @@ def README():
             st.write("Here are some screenshots of what the financial app looks like when it is up and running.")
             
             with st.container(border = True):
-                st.image('screenshots/upload.png')
+                st.image(f'{MASTER_DIRECTORY}/screenshots/upload.png')
                 st.caption("**A place to upload or manually enter data.** Once you configure the logic for automatically saving data from your statements, they will appear here for you confirm and add to your database.")
                 
             with st.container(border = True):
-                st.image('screenshots/expense-example.png')
+                st.image(f'{MASTER_DIRECTORY}/screenshots/expense-example.png')
                 st.caption("**An expense tracker, showing spend in each category.** You can click `View Details` to see a table of the transactions that took place within the selected period, which you can then filter by category.")
                 
             with st.container(border = True):
-                st.image('screenshots/balance-example.png')
+                st.image(f'{MASTER_DIRECTORY}/screenshots/balance-example.png')
                 st.caption("**A balance viewer, showing account balances over time.** You can click `View Details` to see a table of your account balances at the end of each month. Missing data are forward filled by the last recorded balance of each account.")
                 
             
@@ -0,0 +1,95 @@
+import os
+import sys
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from decouple import config
+MASTER_DIRECTORY = config('MASTER_DIRECTORY')
+
+curr_dir = os.path.dirname(__file__)
+sys.path.append(curr_dir)
+
+from upload_utilities import search_data, process_upload, completed, save_data
+from storage_utilities import staging_directory
+
+# the pool is created from a background thread of the app: forked workers could inherit a lock held by another thread
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def ingest_file(filename, bytes_data, directory):
+    '''
+    FUNCTION to classify, parse, and save a single statement; runs in a worker process.
+    input:
+    - filename, name of the statement
+    - bytes_data, contents of the statement
+    - directory, uploads folder of the session the statement is journaled in
+    output: dictionary with the file name, reader, status, number of rows, and time taken
+    '''
+    start = time.perf_counter()
+    result = {"File": filename, "Reader": "", "Status": "", "Rows": 0}
+    try:
+        found, df = search_data(filename, bytes_data)
+        if found:
+            result["Status"] = "Already processed"
+            result["Rows"] = df.shape[0]
+        else:
+            statement = process_upload(filename, bytes_data, directory)
+            if not statement:
+                result["Status"] = "Not recognized"
+            else:
+                result["Reader"] = type(statement).__name__
+                df = statement.get_transactions()
+                if df is None:
+                    result["Status"] = "Could not read"
+                elif completed(df):
+                    save_data(df, statement.filepath, directory)
+                    result["Status"] = "Saved"
+                    result["Rows"] = df.shape[0]
+                else:
+                    # transactions still need categories, upload individually to classify
+                    # the raw file stays journaled, and is listed as an interrupted upload if it is never saved
+                    result["Status"] = "Needs categories"
+                    result["Rows"] = df.shape[0]
+    except Exception as e:
+        result["Status"] = f"Error: {e}"
+    result["Seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def ingest_path(filepath, directory):
+    with open(filepath, 'rb') as f:
+        bytes_data = f.read()
+    return ingest_file(os.path.basename(filepath), bytes_data, directory)
+
+
+def ingest_batch(uploads, max_workers = None, directory = None):
+    '''
+    FUNCTION to ingest many statements concurrently in a process pool.
+    input:
+    - uploads, list of (filename, bytes_data) tuples, or of filepaths read by the worker processes
+    - max_workers, number of worker processes (defaults to the number of CPUs)
+    - directory, uploads folder the statements are journaled in (the uploads folder of the current session if None)
+    output: generator of per-file results, in order of completion
+    '''
+    # worker processes are outside the Streamlit session, they stage uploads in its folder
+    directory = directory or staging_directory()
+    with ProcessPoolExecutor(max_workers = max_workers, mp_context = multiprocessing.get_context(START_METHOD)) as executor:
+        futures = [executor.submit(ingest_path, upload, directory) if isinstance(upload, str) else
+                   executor.submit(ingest_file, *upload, directory) for upload in uploads]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def ingest_folder(folder, max_workers = None):
+    '''
+    FUNCTION to ingest every statement in a folder concurrently in a process pool.
+    Statements that still need categories stay journaled, and are listed as interrupted uploads until they are saved.
+    input:
+    - folder, directory containing .pdf / .csv statements
+    - max_workers, number of worker processes (defaults to the number of CPUs)
+    output: generator of per-file results, in order of completion
+    '''
+    filelist = sorted(os.path.join(folder, ff) for ff in os.listdir(folder)
+                      if ff.endswith(".pdf") or ff.endswith(".csv"))
+    return ingest_batch(filelist, max_workers)
@@ -0,0 +1,174 @@
+import os
+import re
+import sys
+from collections import Counter, defaultdict
+import numpy as np
+import pandas as pd
+
+from decouple import config
+MASTER_DIRECTORY = config('MASTER_DIRECTORY')
+
+curr_dir = os.path.dirname(__file__)
+sys.path.append(curr_dir)
+
+from constants import expense_categories, tabs
+from manifest_utilities import load_statement, ledger_version
+from classifier_utilities import train_classifier, load_classifier, CONFIDENCE_THRESHOLD
+
+
+# models learned in this process: versions, matcher, classifier
+models = dict()
+
+
+def normalize_merchant(description):
+    '''
+    FUNCTION to reduce a transaction description to its merchant tokens, dropping numbers, references, and punctuation.
+    input: description, the transaction description
+    output: string of lowercase tokens separated by single spaces
+    '''
+    if not isinstance(description, str):
+        return ""
+    return " ".join(re.findall(r"[a-z][a-z&']+", description.lower()))
+
+
+def learn_rules(descriptions, categories, min_support = 2, min_purity = 0.9):
+    '''
+    FUNCTION to learn merchant -> category rules from categorized transactions.
+    input:
+    - descriptions, iterable of transaction descriptions
+    - categories, iterable of the categories assigned to them
+    - min_support, number of transactions a merchant must appear in to become a rule
+    - min_purity, share of those transactions that must agree on the category
+    output: rules, dictionary of merchant -> (category, support)
+    '''
+    counts = defaultdict(Counter)
+    for description, category in zip(descriptions, categories):
+        if category not in expense_categories:
+            continue
+        merchant = normalize_merchant(description)
+        if not merchant:
+            continue
+        # the whole merchant string, and each of its tokens as a fallback
+        for key in set([merchant] + merchant.split(" ")):
+            counts[key][category] += 1
+
+    rules = dict()
+    for key, counter in counts.items():
+        category, count = counter.most_common(1)[0]
+        support = sum(counter.values())
+        if support >= min_support and count >= min_purity*support:
+            rules[key] = (category, support)
+    return rules
+
+
+class RuleMatcher:
+    '''
+    CLASS OBJECT for applying merchant rules with a single compiled regular expression.
+    input: rules, dictionary of merchant -> (category, support)
+    '''
+    def __init__(self, rules):
+        self.rules = rules
+        # longest merchants first so the most specific rule wins at each position
+        keys = sorted(rules, key = len, reverse = True)
+        self.pattern = re.compile(r"\b(?:" + "|".join(re.escape(key) for key in keys) + r")\b") if keys else None
+
+    def match(self, description):
+        '''
+        FUNCTION to find the category of a transaction description.
+        input: description, the transaction description
+        output: category, None if no rule matches
+        '''
+        if self.pattern is None:
+            return None
+        found = self.pattern.findall(normalize_merchant(description))
+        if not found:
+            return None
+        best = max(found, key = lambda key: (len(key), self.rules[key][1]))
+        return self.rules[best][0]
+
+
+def saved_statements():
+    # processed .csv files of every location, excluding pending uploads
+    for country in tabs.keys():
+        tag = tabs[country]['tag']
+        for root, dirs, files in os.walk(f"{MASTER_DIRECTORY}/data/{tag}/"):
+            for ff in files:
+                if ff.endswith('.csv'):
+                    yield os.path.join(root, ff), tag
+
+
+def load_models():
+    '''
+    FUNCTION to get the rule matcher and classifier learned from saved statements, relearning only after a statement is saved.
+    output: RuleMatcher object, NaiveBayes object (None if there is not enough data)
+    '''
+    versions = tuple(ledger_version(country) for country in tabs.keys())
+    if models.get("versions") != versions:
+        descriptions, categories = [], []
+        for filepath, tag in saved_statements():
+            df = load_statement(filepath, tag, os.stat(filepath))
+            if "Description" in df.columns and "Category" in df.columns:
+                descriptions.extend(df["Description"])
+                categories.extend(df["Category"])
+        models["matcher"] = RuleMatcher(learn_rules(descriptions, categories))
+        # reuse the persisted classifier if it was trained on the same data
+        models["classifier"] = load_classifier(versions)
+        if models["classifier"] is None:
+            models["classifier"] = train_classifier([normalize_merchant(description) for description in descriptions],
+                                                    categories, versions)
+        models["versions"] = versions
+    return models["matcher"], models["classifier"]
+
+
+def allowed_categories(df, labels):
+    '''
+    FUNCTION to check which predicted categories can be set on a statement.
+    Readers may restrict the Category column to a categorical of their own (e.g. no Credit Card on a credit card statement).
+    input:
+    - df, dataframe with a Category column
+    - labels, series of predicted categories
+    output: boolean series, True where the category is allowed
+    '''
+    if isinstance(df["Category"].dtype, pd.CategoricalDtype):
+        return labels.isin(df["Category"].cat.categories)
+    return pd.Series(True, index = labels.index)
+
+
+def categorize(df, threshold = CONFIDENCE_THRESHOLD):
+    '''
+    FUNCTION to pre-classify transactions without a category, using merchant rules first and the classifier for the rest.
+    Classifier predictions below the threshold are left empty for the user to fill in.
+    input:
+    - df, dataframe with Description and Category columns
+    - threshold, the confidence a classifier prediction needs to be filled in
+    output:
+    - df, the dataframe with predicted categories filled in
+    - confidence, series of the probability of each predicted category (1 for rules, NaN where nothing was predicted)
+    '''
+    confidence = pd.Series(np.nan, index = df.index if df is not None else [])
+    try:
+        if df is None or "Description" not in df.columns or "Category" not in df.columns:
+            return df, confidence
+        matcher, classifier = load_models()
+        df = df.copy()
+        missing = df["Category"].isna()
+        matched = pd.Series([matcher.match(description) for description in df.loc[missing, "Description"]],
+                            index = df.index[missing], dtype = object).dropna()
+        matched = matched[allowed_categories(df, matched)]
+        df.loc[matched.index, "Category"] = matched
+        confidence[matched.index] = 1.0
+
+        # one batch through the classifier for expenses without a rule, classifying incoming amounts is optional
+        missing = df["Category"].isna()
+        if "Amount" in df.columns:
+            missing &= pd.to_numeric(df["Amount"], errors = 'coerce') < 0
+        if classifier is not None and missing.any():
+            labels, probs = classifier.predict([normalize_merchant(description) for description in df.loc[missing, "Description"]])
+            labels = pd.Series(labels, index = df.index[missing], dtype = object)
+            confidence[missing] = probs
+            labels = labels[(confidence[missing] >= threshold) & allowed_categories(df, labels)]
+            df.loc[labels.index, "Category"] = labels
+        return df, confidence
+    except Exception as e:
+        print(e)
+        return df, confidence
@@ -0,0 +1,151 @@
+import os
+import sys
+from zlib import crc32
+import numpy as np
+
+from decouple import config
+MASTER_DIRECTORY = config('MASTER_DIRECTORY')
+CLASSIFIER_PATH = config('CLASSIFIER_PATH', default = f"{MASTER_DIRECTORY}/data/classifier.npz")
+CONFIDENCE_THRESHOLD = config('CONFIDENCE_THRESHOLD', default = 0.6, cast = float)
+
+curr_dir = os.path.dirname(__file__)
+sys.path.append(curr_dir)
+
+from constants import expense_categories
+from storage_utilities import temporary_path
+
+
+N_FEATURES = 1 << 16
+
+
+def ngrams(text):
+    '''
+    FUNCTION to list the features of a normalized description: words, word pairs, and character 3-grams.
+    input: text, normalized description
+    output: set of features
+    '''
+    words = text.split()
+    grams = set(words)
+    grams.update(" ".join(pair) for pair in zip(words, words[1:]))
+    padded = f" {text} "
+    grams.update(padded[i:i+3] for i in range(len(padded) - 2))
+    return grams
+
+
+def hashed_features(texts, n_features = N_FEATURES):
+    '''
+    FUNCTION to hash the features of many descriptions into a sparse (row, column) layout.
+    input:
+    - texts, list of normalized descriptions
+    - n_features, number of hash buckets (a power of 2)
+    output: rows, cols, integer arrays with one entry per feature of each description
+    '''
+    # multiplicative mixing spreads crc32 of short grams evenly over the top bits
+    shift = 32 - (n_features.bit_length() - 1)
+    rows, cols = [], []
+    for i, text in enumerate(texts):
+        hashes = {((crc32(gram.encode())*0x9E3779B1) & 0xFFFFFFFF) >> shift for gram in ngrams(text)}
+        rows.extend([i]*len(hashes))
+        cols.extend(hashes)
+    return np.array(rows, dtype = np.int64), np.array(cols, dtype = np.int64)
+
+
+class NaiveBayes:
+    '''
+    CLASS OBJECT for a multinomial naive Bayes classifier over hashed description features.
+    input:
+    - classes, array of category names
+    - weights, array of log feature probabilities with shape (classes, features)
+    - priors, array of log class probabilities
+    '''
+    def __init__(self, classes, weights, priors):
+        self.classes = classes
+        self.weights = weights
+        self.priors = priors
+
+    @classmethod
+    def fit(cls, texts, labels, alpha = 0.1, n_features = N_FEATURES):
+        '''
+        FUNCTION to train the classifier.
+        input:
+        - texts, list of normalized descriptions
+        - labels, list of their categories
+        - alpha, additive smoothing of feature counts
+        - n_features, number of hash buckets
+        output: NaiveBayes object
+        '''
+        classes, y = np.unique(np.array(labels, dtype = object).astype(str), return_inverse = True)
+        rows, cols = hashed_features(texts, n_features)
+        counts = np.bincount(y[rows]*n_features + cols, minlength = len(classes)*n_features)
+        counts = counts.reshape(len(classes), n_features).astype(np.float64)
+        weights = np.log(counts + alpha) - np.log(counts.sum(axis = 1, keepdims = True) + alpha*n_features)
+        # features never seen in training carry no evidence for any class
+        weights[:, counts.sum(axis = 0) == 0] = 0
+        priors = np.log(np.bincount(y, minlength = len(classes))/len(y))
+        return cls(classes, weights.astype(np.float32), priors)
+
+    def predict(self, texts):
+        '''
+        FUNCTION to classify many descriptions at once.
+        input: texts, list of normalized descriptions
+        output: labels, confidence; arrays of the predicted category and its probability
+        '''
+        if len(texts) == 0:
+            return np.array([], dtype = object), np.array([])
+        rows, cols = hashed_features(texts, self.weights.shape[1])
+        scores = np.tile(self.priors, (len(texts), 1))
+        np.add.at(scores, rows, self.weights[:, cols].T)
+        # softmax over classes
+        scores -= scores.max(axis = 1, keepdims = True)
+        probs = np.exp(scores)
+        probs /= probs.sum(axis = 1, keepdims = True)
+        best = probs.argmax(axis = 1)
+        return self.classes[best].astype(object), probs[np.arange(len(texts)), best]
+
+    def save(self, path, versions):
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        tmp = temporary_path(path)
+        with open(tmp, 'wb') as f:
+            np.savez(f, classes = self.classes, weights = self.weights, priors = self.priors,
+                     versions = np.array(versions, dtype = np.int64))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["classes"], data["weights"], data["priors"]), tuple(data["versions"].tolist())
+
+
+def train_classifier(texts, labels, versions, min_rows = 20):
+    '''
+    FUNCTION to train the classifier on categorized transactions and persist it to disk.
+    input:
+    - texts, list of normalized descriptions
+    - labels, list of their categories
+    - versions, ledger versions of the data it was trained on
+    - min_rows, number of categorized transactions required to train
+    output: NaiveBayes object, None if there is not enough data
+    '''
+    pairs = [(text, label) for text, label in zip(texts, labels) if text and label in expense_categories]
+    if len(pairs) < min_rows or len(set(label for text, label in pairs)) < 2:
+        return None
+    texts, labels = zip(*pairs)
+    model = NaiveBayes.fit(list(texts), list(labels))
+    try:
+        model.save(CLASSIFIER_PATH, versions)
+    except OSError as e:
+        print(e)
+    return model
+
+
+def load_classifier(versions):
+    '''
+    FUNCTION to read the persisted classifier if it was trained on the current data.
+    input: versions, current ledger versions
+    output: NaiveBayes object, None if missing or out of date
+    '''
+    try:
+        model, trained = NaiveBayes.load(CLASSIFIER_PATH)
+        return model if trained == tuple(versions) else None
+    except (OSError, KeyError, ValueError):
+        return None
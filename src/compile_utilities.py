@@ -5,92 +5,147 @@ import pandas as pd
 
 from decouple import config
 MASTER_DIRECTORY = config('MASTER_DIRECTORY')
+LEDGER_ENGINE = config('LEDGER_ENGINE', default = 'csv')
 
 curr_dir = os.path.dirname(__file__)
 sys.path.append(curr_dir)
 
 from constants import expense_categories, tabs
+from ledger_utilities import read_ledger
+from sql_utilities import query_ledger
+from profile_utilities import timed
+from manifest_utilities import scan_statements
 
 
+@timed("compile")
 def compile_statements(country, period, exclude = ['paystubs.csv']):
     '''
     FUNCTION to compile .csv files with spending amounts and classified categories.
     input:
     - country, the subfolder to be searched and compiled
+    - period, tuple of (start, end) dates
     - exclude, a list of files that are to be excluded
     '''
     assert country in list(tabs.keys())
     try:
-        # compile data for specified country
-        os.chdir(MASTER_DIRECTORY)
-        path = os.getcwd() + f"/data/{tabs[country]['tag']}/"
-        filelist = []
-        for root, dirs, files in os.walk(path):
-            for ff in files:
-                if ff.endswith('.csv') and all(not ff.endswith(ex) for ex in exclude):
-                    filelist.append(os.path.join(root,ff))
+        # read only the partitions overlapping the period from the parquet ledger
+        if LEDGER_ENGINE == 'parquet':
+            return read_ledger(country, period, exclude)
         
-        # create master dataframe sorted by date with source column
-        master_df = pd.DataFrame()
-        for file in filelist:
-            df = pd.read_csv(file)
-            if "Source" not in df.columns:
-                df["Source"] = file[file.find(f"{tabs[country]['tag']}/")+3:file.rfind("/")]
-            master_df = master_df.append(df)
-        master_df = master_df.loc[:, ~master_df.columns.str.contains('^Unnamed')]
-        master_df.sort_values(by = "Date", inplace = True)
-        master_df["Date"] = pd.to_datetime(master_df["Date"]).dt.date
+        # answer the date range from the (tag, date) index of the sqlite ledger
+        if LEDGER_ENGINE == 'sqlite':
+            return query_ledger(country, period, exclude = exclude)
+        
+        # compile data for specified country, reading only new or modified files
+        master_df = scan_statements(country, period, exclude)
+        # stable, so transactions on the same date stay in statement and row order (e.g. the last balance of a day)
+        master_df = master_df.sort_values(by = "Date", kind = "stable")
         
         # filter based on specified period
-        filtered_df = master_df.loc[(master_df["Date"] >= period[0]) &
-                                    (master_df["Date"] <= period[1])]
+        return filter_period(master_df, period)
+    except Exception as e:
+        print(e)
+
+
+def filter_period(df, period):
+    '''
+    FUNCTION to select the transactions within a period from a compiled dataframe.
+    input:
+    - df, the compiled dataframe
+    - period, tuple of (start, end) dates
+    output: filtered_df, the transactions within the period
+    '''
+    try:
+        filtered_df = df.loc[(df["Date"] >= period[0]) & (df["Date"] <= period[1])]
         filtered_df = filtered_df.reset_index(drop = True)
         return filtered_df
     except Exception as e:
         print(e)
 
 
-def category_table(df, period):
+def select_transactions(country, df, period, categories):
+    '''
+    FUNCTION to select the transactions shown in the details table.
+    input:
+    - country, the subfolder of the data
+    - df, the compiled dataframe of the period
+    - period, tuple of (start, end) dates
+    - categories, list of categories to be selected
+    output: selected_df, the matching transactions
+    '''
+    try:
+        # index lookups in the sqlite ledger instead of scanning the dataframe
+        if LEDGER_ENGINE == 'sqlite':
+            return query_ledger(country, period, categories)
+        
+        selected_df = df.loc[df["Category"].isin(categories)]
+        return selected_df.reset_index(drop = True)
+    except Exception as e:
+        print(e)
+
+
+@timed("category_table")
+def category_table(df, period, freq = None):
     '''
     FUNCTION to create expense category table.
-    input: df, the input dataframe
-    output: output_df, the output dateframe
+    input:
+    - df, the input dataframe
+    - period, tuple of (start, end) dates
+    - freq, pandas frequency (e.g. 'M' for monthly) to split the period into one row per interval, one row for the whole period if None
+    output: output_df, the output dateframe with one row per period and one column per category
     '''
     try:
-        period_str = f"{datetime.strftime(period[0], '%d %b %Y')} to {datetime.strftime(period[1], '%d %b %Y')}"
-        store = dict()
-        for cat in expense_categories:
-            if cat != "Credit Card": # remove credit card payments
-                store[cat] = -1*sum(df.loc[df["Category"] == cat]["Amount"])
-        output_df = pd.DataFrame.from_dict(store, orient = 'index', columns = [period_str])
-        output_df = output_df.sort_index()
-        return output_df.T
+        categories = sorted(cat for cat in expense_categories if cat != "Credit Card") # remove credit card payments
+        expenses = df.loc[df["Category"].isin(categories)]
+        
+        # label each transaction with its period
+        if freq is None:
+            index = [f"{datetime.strftime(period[0], '%d %b %Y')} to {datetime.strftime(period[1], '%d %b %Y')}"]
+            labels = pd.Series(index[0], index = expenses.index)
+        else:
+            index = pd.period_range(period[0], period[1], freq = freq).astype(str)
+            labels = pd.to_datetime(expenses["Date"]).dt.to_period(freq).astype(str)
+        
+        # sum of expenses per period and category in a single aggregation
+        totals = expenses.groupby([labels, expenses["Category"]])["Amount"].sum().unstack()
+        output_df = (-1*totals).reindex(index = index, columns = categories, fill_value = 0)
+        output_df = output_df.fillna(0).astype("float64").rename_axis(index = None, columns = None)
+        return output_df
     except Exception as e:
         print(e)
     
     
-def balance_table(df, period):
+@timed("balance_table")
+def balance_table(df, period, ffill = True):
     '''
     FUNCTION to get account balance timeseries.
-    input: df, the input dataframe
-    output: output_df, the output dataframe
+    input:
+    - df, the input dataframe
+    - period, tuple of (start, end) dates
+    - ffill, whether months without a statement carry the last recorded balance of each source forward
+    output: output_df, the output dataframe of month-end balances with one column per source
     '''
     try:
-        series = df[["Date","Balance","Source"]]
-        series = series[~series["Balance"].isna()] # rows with balance column filled
-        series.loc[:,"Date"] = pd.to_datetime(series["Date"])
-        series.set_index("Date", inplace = True)
-        
-        # last recorded balance of the month for each source
-        output_df = pd.DataFrame()
-        for source in set(series["Source"]):
-            source_slice = series[series["Source"] == source].resample('M').last()
-            output_df = output_df.append(source_slice)
+        series = df.loc[~df["Balance"].isna(), ["Date","Balance","Source"]] # rows with balance column filled
+        series = series.assign(Date = pd.to_datetime(series["Date"])).set_index("Date")
         
-        output_df.reset_index(inplace = True)
-        output_df.columns = ["Date","Balance","Source"]
+        # last recorded balance of the month for each source, in a single grouped resample
+        output_df = series.groupby("Source")["Balance"].resample('M').last().unstack("Source")
+        output_df = output_df.dropna(how = 'all').sort_index()
+        if ffill:
+            output_df = output_df.ffill()
         return output_df
     except Exception as e:
         print(e)
 
 
+def latest_balances(balance_df):
+    '''
+    FUNCTION to get the last recorded balance of each source.
+    input: balance_df, the output dataframe of balance_table
+    output: series of balances indexed by source
+    '''
+    try:
+        return balance_df.ffill().iloc[-1]
+    except Exception as e:
+        print(e)
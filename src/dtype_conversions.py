@@ -1,5 +1,7 @@
 import re
 from datetime import datetime
+import numpy as np
+import pandas as pd
 
 
 def str_to_date(date_string):
@@ -26,6 +28,18 @@ def str_to_float(dollars_string):
     return mult*float(dollars)
 
 
+def strs_to_floats(dollars_strings):
+    '''
+    FUNCTION to convert a list of strings to numerical values, vectorized version of str_to_float
+    input: dollars_strings, list of input strings
+    output: dollars, numerical values as a numpy array of floats
+    '''
+    series = pd.Series(dollars_strings, dtype = "object")
+    mult = np.where(series.str.contains("-", regex = False), -1, 1)
+    dollars = series.str.replace(r'[^0-9.]', "", regex = True).astype("float64")
+    return mult*dollars.to_numpy()
+
+
 def float_to_str(dollars):
     '''
     FUNCTION to convert numerical value to string with 1000s separator and 2 d.p.
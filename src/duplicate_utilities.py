@@ -0,0 +1,131 @@
+import os
+import sys
+from hashlib import sha1
+import pandas as pd
+
+from decouple import config
+MASTER_DIRECTORY = config('MASTER_DIRECTORY')
+
+curr_dir = os.path.dirname(__file__)
+sys.path.append(curr_dir)
+
+from storage_utilities import load_json, save_json
+from manifest_utilities import read_csv_statement, update_manifest, manifest_signature
+from rollup_utilities import statement_file
+from categorize_utilities import normalize_merchant
+
+
+# fingerprint indexes loaded in this process: tag -> (statements, {fingerprint: file})
+indexes = dict()
+
+
+def fingerprint_path(tag):
+    return f"{MASTER_DIRECTORY}/data/{tag}.fingerprints.json"
+
+
+def fingerprint_rows(df, source):
+    '''
+    FUNCTION to hash each transaction by date, normalized description, amount, and source.
+    input:
+    - df, dataframe with Date, Description, and Amount columns
+    - source, the source of transactions without a Source column
+    output: list of fingerprints, None for rows without a date or amount
+    '''
+    dates = pd.to_datetime(df["Date"], errors = 'coerce')
+    amounts = pd.to_numeric(df["Amount"], errors = 'coerce') if "Amount" in df.columns else pd.Series(float("nan"), index = df.index)
+    descriptions = df["Description"] if "Description" in df.columns else pd.Series("", index = df.index)
+    sources = df["Source"] if "Source" in df.columns else pd.Series(source, index = df.index)
+
+    fingerprints = []
+    for d, description, amount, src in zip(dates, descriptions, amounts, sources):
+        if pd.isna(d) or pd.isna(amount):
+            fingerprints.append(None)
+            continue
+        key = f"{d.date().isoformat()}|{normalize_merchant(description)}|{amount:.2f}|{src}"
+        fingerprints.append(sha1(key.encode()).hexdigest()[:16])
+    return fingerprints
+
+
+def index_statement(filepath, tag):
+    '''
+    FUNCTION to fingerprint the transactions of a processed statement.
+    input:
+    - filepath, to .csv file
+    - tag, the location tag of the statement
+    output: entry, dictionary of the size and modification time of the statement, and its fingerprints
+    '''
+    stat = os.stat(filepath)
+    df = read_csv_statement(filepath, tag)
+    return {"size": stat.st_size, "mtime": stat.st_mtime_ns,
+            "fingerprints": [ff for ff in fingerprint_rows(df, None) if ff is not None]}
+
+
+def reconcile_fingerprints(tag, manifest):
+    '''
+    FUNCTION to bring the fingerprints of a location tag in line with its manifest, fingerprinting only statements that were added or modified.
+    input:
+    - tag, the location tag of the statements
+    - manifest, from update_manifest
+    output: entries, dictionary of statement file -> size, mtime, and fingerprints
+    '''
+    entries = load_json(fingerprint_path(tag), default = dict())
+    # entries saved without the size and modification time of their statement are fingerprinted again
+    current = {file: entry for file, entry in entries.items()
+               if file in manifest and isinstance(entry, dict) and
+               (entry["size"], entry["mtime"]) == (manifest[file]["size"], manifest[file]["mtime"])}
+    if len(current) == len(entries) == len(manifest):
+        return entries
+    for file in manifest:
+        if file not in current:
+            current[file] = index_statement(f"{MASTER_DIRECTORY}/data/{tag}/{file}", tag)
+    save_json(fingerprint_path(tag), current)
+    return current
+
+
+def update_fingerprints(filepath, tag):
+    '''
+    FUNCTION to replace the fingerprints of a saved statement.
+    input:
+    - filepath, to the saved .csv file
+    - tag, the location tag of the statement
+    '''
+    try:
+        entries = load_json(fingerprint_path(tag), default = dict())
+        entries[statement_file(filepath, tag)] = index_statement(filepath, tag)
+        save_json(fingerprint_path(tag), entries)
+    except Exception as e:
+        print(e)
+
+
+def load_fingerprints(tag):
+    '''
+    FUNCTION to get the fingerprint index of a location tag, fingerprinting statements added or modified since it was saved.
+    input: tag, the location tag
+    output: dictionary of fingerprint -> statement file it was saved in
+    '''
+    manifest = update_manifest(tag)
+    signature = manifest_signature(manifest)
+    if tag not in indexes or indexes[tag][0] != signature:
+        entries = reconcile_fingerprints(tag, manifest)
+        index = {ff: file for file, entry in entries.items() for ff in entry["fingerprints"]}
+        indexes[tag] = (signature, index)
+    return indexes[tag][1]
+
+
+def find_duplicates(df, folder, exclude = None):
+    '''
+    FUNCTION to look up the transactions of a new statement in the fingerprint index of saved statements.
+    input:
+    - df, the new statement
+    - folder, where the statement will be saved (<tag>/<source>)
+    - exclude, a saved statement file to ignore (e.g. the one being replaced)
+    output: series of the saved statement file matching each row, None if the row is new
+    '''
+    try:
+        tag, source = folder.split("/", 1)
+        index = load_fingerprints(tag)
+        matches = [index.get(ff) if ff is not None else None for ff in fingerprint_rows(df, source)]
+        return pd.Series([mm if mm != exclude else None for mm in matches], index = df.index, dtype = object)
+    except Exception as e:
+        print(e)
+        return pd.Series(None, index = df.index, dtype = object)
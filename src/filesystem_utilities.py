@@ -0,0 +1,238 @@
+import os
+import sys
+import threading
+
+from decouple import config
+MASTER_DIRECTORY = config('MASTER_DIRECTORY')
+FILE_INDEX = config('FILE_INDEX', default = f"{MASTER_DIRECTORY}/data/files.json")
+FILE_WATCHER = config('FILE_WATCHER', default = False, cast = bool)
+UPLOAD_INDEX = config('UPLOAD_INDEX', default = f"{MASTER_DIRECTORY}/data/digests.json")
+
+curr_dir = os.path.dirname(__file__)
+sys.path.append(curr_dir)
+
+from constants import tabs
+from storage_utilities import load_json, save_json, locked
+from profile_utilities import cache_lookup
+from pdf_utilities import hash_file
+
+
+class FileIndex:
+    '''
+    CLASS OBJECT for a persistent index of the statement files saved under data/<tag>/, by file name.
+    Each directory is stored with its modification time, which changes whenever a file is added, removed, or renamed in it,
+    so only changed directories are listed again. The index is kept on disk between sessions.
+    input:
+    - path, to the json file of the index
+    - watch, whether file system events (watchdog) mark directories to be checked, instead of checking every directory
+    '''
+    def __init__(self, path = FILE_INDEX, watch = FILE_WATCHER):
+        self.path = path
+        self.watch = watch
+        self.root = f"{MASTER_DIRECTORY}/data"
+        self.directories = None # directory (relative to data/) -> modification time
+        self.files = dict() # directory (relative to data/) -> file names
+        self.names = dict() # file name -> directories
+        self.dirty = set() # directories changed since the last refresh, reported by the watcher
+        self.observer = None
+        self.lock = threading.RLock() # sessions look up files from concurrent threads
+
+
+    def load(self):
+        entries = load_json(self.path, default = {})
+        self.directories = entries.get("directories", {})
+        self.files = {directory: set(names) for directory, names in entries.get("files", {}).items()}
+        self.names = dict()
+        for directory, names in self.files.items():
+            for name in names:
+                self.names.setdefault(name, set()).add(directory)
+        if self.watch:
+            self.start_watcher()
+
+
+    def scan(self, directory):
+        '''
+        FUNCTION to list a directory again, and any subdirectory not yet indexed
+        input: directory, relative to data/
+        '''
+        path = os.path.join(self.root, directory)
+        # modification time is read first, so a change while listing is picked up on the next refresh
+        self.directories[directory] = os.stat(path).st_mtime_ns
+        names = set()
+        for entry in os.scandir(path):
+            if entry.is_dir():
+                subdirectory = f"{directory}/{entry.name}"
+                if subdirectory not in self.directories:
+                    self.scan(subdirectory)
+            else:
+                names.add(entry.name)
+        for name in self.files.get(directory, set()) - names:
+            self.names[name].discard(directory)
+        for name in names:
+            self.names.setdefault(name, set()).add(directory)
+        self.files[directory] = names
+
+
+    def forget(self, directory):
+        # drop a deleted directory and everything below it
+        for subdirectory in [d for d in self.directories if d == directory or d.startswith(directory + "/")]:
+            del self.directories[subdirectory]
+            for name in self.files.pop(subdirectory, set()):
+                self.names[name].discard(subdirectory)
+
+
+    def refresh(self):
+        '''
+        FUNCTION to bring the index up to date, listing only the directories that changed
+        '''
+        with self.lock:
+            self.update()
+
+
+    def update(self):
+        if self.directories is None:
+            self.load()
+        if self.observer is not None:
+            dirty, self.dirty = self.dirty, set()
+            check = [d for d in self.directories if d in dirty]
+        else:
+            check = list(self.directories)
+        check += [tabs[country]['tag'] for country in tabs if tabs[country]['tag'] not in self.directories]
+
+        changed = False
+        for directory in check:
+            if directory not in self.directories and "/" in directory:
+                continue # already dropped with its parent
+            try:
+                mtime = os.stat(os.path.join(self.root, directory)).st_mtime_ns
+            except OSError:
+                changed = changed or directory in self.directories
+                self.forget(directory)
+                continue
+            if self.directories.get(directory) != mtime:
+                self.scan(directory)
+                changed = True
+        cache_lookup("file index", not changed)
+        if changed:
+            save_json(self.path, {"directories": self.directories,
+                                  "files": {directory: sorted(names) for directory, names in self.files.items()}})
+
+
+    def add(self, filepath):
+        '''
+        FUNCTION to add a file written by the app, without waiting for the next refresh
+        input: filepath, to the file in data/<tag>/
+        '''
+        with self.lock:
+            if self.directories is None:
+                self.load()
+            directory, name = os.path.split(os.path.relpath(filepath, self.root).replace(os.sep, "/"))
+            if directory in self.directories:
+                self.files[directory].add(name)
+                self.names.setdefault(name, set()).add(directory)
+
+
+    def find(self, name):
+        '''
+        FUNCTION to find the saved files with a name
+        input: name, file name, optionally preceded by its subdirectories (e.g. HSBC/FEB-2024.csv)
+        output: list of filepaths, sorted
+        '''
+        name = name.strip("/")
+        basename = name[name.rfind("/")+1:]
+        with self.lock:
+            self.update()
+            return sorted(f"{self.root}/{directory}/{basename}" for directory in self.names.get(basename, [])
+                          if f"/{directory}/{basename}".endswith(f"/{name}"))
+
+
+    def start_watcher(self):
+        '''
+        FUNCTION to mark directories as changed from file system events, if watchdog is installed
+        '''
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            return
+        index = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                for path in [event.src_path, getattr(event, "dest_path", "")]:
+                    if path:
+                        relpath = os.path.relpath(path, index.root).replace(os.sep, "/")
+                        # a file event changes its directory, a directory event may also be a new or deleted directory
+                        index.dirty.update([os.path.dirname(relpath), relpath])
+
+        try:
+            self.observer = Observer()
+            for country in tabs:
+                path = os.path.join(self.root, tabs[country]['tag'])
+                if os.path.isdir(path):
+                    self.observer.schedule(Handler(), path, recursive = True)
+            self.observer.daemon = True
+            self.observer.start()
+            # changes made while the app was not running
+            self.dirty.update(self.directories)
+        except Exception as e:
+            print(e)
+            self.observer = None
+
+
+file_index = FileIndex()
+
+
+def find_files(name):
+    return file_index.find(name)
+
+
+def add_file(filepath):
+    file_index.add(filepath)
+
+
+def build_upload_index():
+    '''
+    FUNCTION to index the content hash of every original statement saved next to its processed .csv file.
+    output: entries, dictionary of content hash -> .csv file (relative to data/)
+    '''
+    file_index.refresh()
+    entries = dict()
+    for directory, names in file_index.files.items():
+        for name in names:
+            stem = name[:name.rfind(".")] if "." in name else name
+            if not name.endswith('.csv') and stem + '.csv' in names:
+                entries[hash_file(f"{file_index.root}/{directory}/{name}")] = f"{directory}/{stem}.csv"
+    save_json(UPLOAD_INDEX, entries)
+    return entries
+
+
+def find_upload(digest):
+    '''
+    FUNCTION to find the processed .csv file of a statement from its contents, whatever its file name.
+    input: digest, content hash of the statement
+    output: filepath, to the .csv file, None if the statement has not been saved
+    '''
+    entries = load_json(UPLOAD_INDEX)
+    if entries is None:
+        entries = build_upload_index()
+    filepath = f"{file_index.root}/{entries[digest]}" if digest in entries else None
+    cache_lookup("upload digests", filepath is not None)
+    if filepath and os.path.exists(filepath):
+        return filepath
+    return None
+
+
+def record_upload(digest, filepath):
+    '''
+    FUNCTION to remember the processed .csv file saved for a statement.
+    input:
+    - digest, content hash of the statement
+    - filepath, to the saved .csv file in data/<tag>/
+    '''
+    with locked(UPLOAD_INDEX):
+        entries = load_json(UPLOAD_INDEX)
+        if entries is None:
+            entries = build_upload_index()
+        entries[digest] = os.path.relpath(filepath, file_index.root).replace(os.sep, "/")
+        save_json(UPLOAD_INDEX, entries)
@@ -1,7 +1,6 @@
 import os
 import sys
 import pandas as pd
-import altair as alt
 import streamlit as st
 from annotated_text import annotated_text
 
@@ -12,6 +11,7 @@ curr_dir = os.path.dirname(__file__)
 sys.path.append(curr_dir)
 
 from dtype_conversions import float_to_str
+from profile_utilities import timed
 
 
 pd.set_option('display.precision', 2)
@@ -35,20 +35,24 @@ def create_annotations(df, column, threshold, labels):
         print(e)
         
         
-def format_table(df, column = "Amount"):
+def format_table(df, column = "Amount", confidence = None, threshold = 0.6):
     '''
     FUNCTION to format a table by highlighting a cell in a column based on if it exceeds a value.
     input:
     - df, the input dataframe
     - column, the column to be highlighted
-    - threshold, the value to be exceeded to highlight a cell
-    - bcolors, the colors to be used to highlight a cell
+    - confidence, series of the confidence of each predicted category, low confidence categories are highlighted for review
+    - threshold, the confidence below which a category is highlighted
     '''
     try:
-        if column in list(df.columns):
-            return df.style.applymap(highlight, subset = column)
-        else:
+        if column not in list(df.columns) and confidence is None:
             return df
+        styler = df.style
+        if column in list(df.columns):
+            styler = styler.applymap(highlight, subset = column)
+        if confidence is not None and "Category" in list(df.columns):
+            styler = styler.apply(lambda col: [highlight_uncertain(c, threshold) for c in confidence.reindex(col.index)], subset = "Category")
+        return styler
     except Exception as e:
         print(e)
 
@@ -68,6 +72,7 @@ def highlight(val, threshold = 0, bcolors = ['#03DAC6', '#CF6679']):
         print(e)
         
 
+@timed("chart horizontal_bar", count = None)
 def horizontal_bar(chart_data, redact, size = 40):
     '''
     FUNCTION to create a horizontal stacked bar chart.
@@ -75,6 +80,7 @@ def horizontal_bar(chart_data, redact, size = 40):
     output: chart object
     '''
     try:
+        import altair as alt # heavy libraries are imported where they are used, to keep app start fast
         chart_data.index = [""]
         data = pd.melt(chart_data.reset_index(), id_vars = ["index"])
         
@@ -128,6 +134,7 @@ def local_css(filename):
         st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html = True)
 
 
+@timed("chart vertical_bar", count = None)
 def vertical_bar(chart_data, redact):
     '''
     FUNCTION to create a vertical stacked bar chart.
@@ -135,6 +142,7 @@ def vertical_bar(chart_data, redact):
     output: chart object
     '''
     try:
+        import altair as alt
         melt_df = pd.melt(chart_data.reset_index(), id_vars = ['Date'], value_vars = chart_data.columns)
         size = melt_df.shape[0]/5.5
         
@@ -199,3 +207,12 @@ def update_data_editor(original_data, compulsory_cols, update_session_tag = "edi
         
     except Exception as e:
         print(e)
+
+
+def highlight_uncertain(val, threshold, bcolor = '#FFD166'):
+    '''
+    FUNCTION to choose the background color of a predicted category cell based on its confidence
+    '''
+    if val < threshold:
+        return f'background-color: {bcolor}'
+    return ''
@@ -13,7 +13,13 @@ sys.path.append(curr_dir)
 from constants import expense_categories, tabs, converter
 from dtype_conversions import float_to_str
 from format_utilities import create_annotations, format_table, update_data_editor
-from upload_utilities import search_data, process_upload, completed, save_data, list_files
+from upload_utilities import search_data, completed, save_data, list_files, record_statement, interrupted_uploads
+from job_utilities import submit_upload, submit_batch
+from categorize_utilities import categorize
+from classifier_utilities import CONFIDENCE_THRESHOLD
+from duplicate_utilities import find_duplicates
+from profile_utilities import stage_summary, latency_histograms, cache_summary, reset, profile_upload
+from storage_utilities import save_csv, staging_directory
 
 
 
@@ -30,47 +36,74 @@ def uploader(border = True):
             if "file_upload" not in st.session_state:
                 st.session_state["file_upload"] = uploaded_file
             
-            # if file found, load processed dataframe
-            bool, df = search_data(uploaded_file.name)
+            # if file found (by name or contents), load processed dataframe
+            bytes_data = uploaded_file.getvalue()
+            bool, df = search_data(uploaded_file.name, bytes_data)
             if bool:
                 if "upload_data" not in st.session_state:
                     st.session_state["upload_data"] = df
                 if "preprocessed" not in st.session_state:
                     st.session_state["preprocessed"] = True
+                st.session_state.pop("upload_job", None)
+                st.session_state.pop("upload_file_id", None)
+                st.session_state.pop("upload_categorized", None)
                     
-            # if file not found, create processed dataframe and save in relevant data folder
+            # if file not found, create processed dataframe in the background and save in relevant data folder
             else:
-                bytes_data = uploaded_file.read()
-                with open(f"{MASTER_DIRECTORY}/data/uploads/{uploaded_file.name}", 'wb') as f:
-                    f.write(bytes_data)
-                statement = process_upload(f"{uploaded_file.name}", bytes_data)
-                if statement:
-                    df = statement.get_transactions()
+                # a file replaced under the same name is a new upload, with a new file id
+                job = st.session_state.get("upload_job")
+                if job is None or st.session_state.get("upload_file_id") != uploaded_file.file_id:
+                    job = submit_upload(uploaded_file.name, bytes_data, staging_directory())
+                    st.session_state["upload_job"] = job
+                    st.session_state["upload_file_id"] = uploaded_file.file_id
+                
+                if not job.done():
+                    # the rest of the page stays usable, the app checks the job again shortly
+                    st.progress(job.fraction(), text = job.describe())
+                    st.session_state["JobsPending"] = True
+                elif job.result and job.result[1] is not None:
+                    statement = job.result[0]
                     if "upload_data" not in st.session_state:
+                        # pre-classify with merchant rules and the classifier learned from saved statements, once per upload
+                        if st.session_state.get("upload_categorized", (None,))[0] is not job:
+                            df, confidence = categorize(job.result[1].copy())
+                            # transactions already saved from another statement
+                            st.session_state["upload_categorized"] = (job, df, confidence, find_duplicates(df, statement.folder))
+                        _, df, confidence, duplicates = st.session_state["upload_categorized"]
                         st.session_state["upload_data"] = df
+                        st.session_state["upload_confidence"] = confidence
+                        st.session_state["upload_duplicates"] = duplicates
                     if "preprocessed" not in st.session_state:
                         st.session_state["preprocessed"] = False
                 else:
                     st.write("⚠️ ERROR: Could not process file contents")
             
             # show dataframe (either extracted or preprocessed)
+            pending = "upload_job" in st.session_state and not st.session_state["upload_job"].done()
             if "upload_data" in st.session_state:
                 df = st.session_state["upload_data"]
                 if "Amount" in df.columns:
                     create_annotations(df, column = "Amount", threshold = 0, labels = ["Outgoing", "Incoming"])
-                df = format_table(df)
+                # highlight predicted categories that need review
+                df = format_table(df, confidence = st.session_state.get("upload_confidence"), threshold = CONFIDENCE_THRESHOLD)
                 # not editable if already preprocessed
                 if st.session_state["preprocessed"]:
                     classified_df = st.data_editor(df, num_rows = 'fixed', disabled = True, use_container_width = True)
                 else:
                     classified_df = st.data_editor(df, num_rows = 'fixed', disabled = ('Date','Amount','Balance'), use_container_width = True)
                     
+                    duplicates = st.session_state.get("upload_duplicates")
+                    if duplicates is not None and duplicates.notna().any():
+                        st.write(f"⚠️ {duplicates.notna().sum()} transactions match transactions already saved in other statements.")
+                        st.dataframe(st.session_state["upload_data"].loc[duplicates.notna()].assign(**{"Saved In": duplicates.dropna()}),
+                                     use_container_width = True)
+                    
                     # save in same directory as raw data file
                     save = st.button("Upload", disabled = completed(classified_df)==False, key = "AutoUpload")
                     if save:
-                        save_data(classified_df, uploaded_file.name)
+                        save_data(classified_df, statement.filepath)
                         
-            else:
+            elif not pending:
                 st.write("⚠️ ERROR: Could not read file")
         
             # reset session_state for new upload
@@ -78,7 +111,38 @@ def uploader(border = True):
             if "upload_data" in st.session_state:
                 st.session_state.pop("upload_data")
                 st.session_state.pop("preprocessed")
+                st.session_state.pop("upload_confidence", None)
+                st.session_state.pop("upload_duplicates", None)
+        else:
+            st.session_state.pop("upload_job", None)
+            st.session_state.pop("upload_file_id", None)
+            st.session_state.pop("upload_categorized", None)
+            
+            
             
+def batch_uploader(border = True):
+    '''
+    FUNCTION to create a batch uploader that parses many statements concurrently and reports per-file status.
+    '''
+    with st.container(border = border):
+        uploaded_files = st.file_uploader("Upload a folder of statements", accept_multiple_files = True, key = "BatchFiles")
+        
+        process = st.button("Process all", disabled = len(uploaded_files) == 0, key = "BatchUpload")
+        if process:
+            uploads = [(uploaded_file.name, uploaded_file.getvalue()) for uploaded_file in uploaded_files]
+            st.session_state["batch_job"] = submit_batch(uploads, staging_directory())
+        
+        # statements are parsed in the background, results are shown as they complete
+        job = st.session_state.get("batch_job")
+        if job is not None:
+            st.progress(job.fraction(), text = job.describe())
+            if job.partial:
+                st.dataframe(pd.DataFrame(list(job.partial)), use_container_width = True)
+            if not job.done():
+                st.session_state["JobsPending"] = True
+            else:
+                saved = sum(result["Status"] == "Saved" for result in job.partial)
+                st.caption(f"{saved}/{len(job.partial)} statements saved. Statements that need categories can be uploaded individually above.")
             
             
 def tabulator(border = True):
@@ -158,7 +222,7 @@ def tabulator(border = True):
                     os.mkdir(subdir)
                 filepath = subdir + filename[filename.find('/')+1:] + '.csv'
             else:
-                filepath = os.getcwd() + f"/data/{tag}/{filename}.csv"
+                filepath = f"{MASTER_DIRECTORY}/data/{tag}/{filename}.csv"
 
         def disable_button(edited):
             # no rows added
@@ -170,9 +234,16 @@ def tabulator(border = True):
             else:
                 return False
     
+        # warn about entries already saved from a statement of the same source
+        if tabletype == 'Expense' and filename and filename.count("/") == 1 and edited.shape[0] > 0:
+            duplicates = find_duplicates(edited.reset_index(), f"{tag}/{filename[:filename.find('/')]}")
+            if duplicates.notna().any():
+                st.write(f"⚠️ {duplicates.notna().sum()} entries match transactions already saved in `{', '.join(sorted(set(duplicates.dropna())))}`.")
+        
         submit_button = st.button("Submit", disabled = disable_button(edited), key = "ManualUpload")
         if submit_button and st.session_state["SubmitError"]==False:
-            edited.reset_index().to_csv(filepath, index = True)
+            save_csv(edited.reset_index(), filepath, index = True)
+            record_statement(filepath)
             st.write(f"Data uploaded to `~/data/{tag}/{filename}.csv`")
 
 
@@ -225,7 +296,7 @@ def show_cards(country, redact):
             with cc1:
                 ccards, ctext = st.columns([1, 3])
                 with ccards:
-                    st.image("images/hsbc-revolution.jpg", width = 175)
+                    st.image(f"{MASTER_DIRECTORY}/images/hsbc-revolution.jpg", width = 175)
                 if not redact:
                     with ctext:
                         st.caption("No Annual Fee | 3.25% Foreign Currency Transaction Fee")
@@ -234,7 +305,7 @@ def show_cards(country, redact):
             with cc2:
                 ccards, ctext = st.columns([1, 3])
                 with ccards:
-                    st.image("images/ocbc-90nmastercard.png", width = 175)
+                    st.image(f"{MASTER_DIRECTORY}/images/ocbc-90nmastercard.png", width = 175)
                 if not redact:
                     with ctext:
                         st.caption("S\$196.20 Annual Fee | 3.25% Foreign Currency Transaction Fee + Mastercard Fees (~1%)")
@@ -244,7 +315,7 @@ def show_cards(country, redact):
             with cc3:
                 ccards, ctext = st.columns([1, 3])
                 with ccards:
-                    st.image("images/sc-smart.jpg", width = 175)
+                    st.image(f"{MASTER_DIRECTORY}/images/sc-smart.jpg", width = 175)
                 if not redact:
                     with ctext:
                         st.caption("No Annual Fee | 3.5% Foreign Currency Transaction Fee")
@@ -256,7 +327,7 @@ def show_cards(country, redact):
             with cc1:
                 ccards, ctext = st.columns([1, 3])
                 with ccards:
-                    st.image("images/chase-unitedgateway.png", width = 175)
+                    st.image(f"{MASTER_DIRECTORY}/images/chase-unitedgateway.png", width = 175)
                 if not redact:
                     with ctext:
                         st.caption("No Annual Fee | No Foreign Currency Transaction Fee")
@@ -265,7 +336,7 @@ def show_cards(country, redact):
             with cc2:
                 ccards, ctext = st.columns([1, 3])
                 with ccards:
-                    st.image("images/boa-travelrewards.jpg", width = 175)
+                    st.image(f"{MASTER_DIRECTORY}/images/boa-travelrewards.jpg", width = 175)
                 if not redact:
                     with ctext:
                         st.caption("No Annual Fee | No Foreign Currency Transaction Fee")
@@ -276,3 +347,41 @@ def show_cards(country, redact):
             
     except Exception as e:
         print(e)
+
+
+
+def diagnostics():
+    '''
+    FUNCTION to create a diagnostics page with stage timings, cache hit rates, and an upload profiler.
+    '''
+    st.header("🩺 Diagnostics")
+    st.caption("Measurements of this app process since it started (or was reset).")
+    
+    st.subheader("Stages")
+    st.dataframe(stage_summary(), use_container_width = True, hide_index = True)
+    with st.expander("Latency Histograms"):
+        st.dataframe(latency_histograms(), use_container_width = True)
+    
+    st.subheader("Caches")
+    st.dataframe(cache_summary(), use_container_width = True, hide_index = True)
+    
+    if st.button("Reset measurements", key = "ResetDiagnostics"):
+        reset()
+        st.rerun()
+    
+    # statements written to their folder whose processed .csv was never saved, e.g. after a crash
+    interrupted = interrupted_uploads()
+    if interrupted:
+        st.subheader("Interrupted Uploads")
+        st.caption("Upload these statements again to process and save them.")
+        st.dataframe(pd.DataFrame(interrupted, columns = ["filename", "filepath"]), use_container_width = True, hide_index = True)
+    
+    # profile extraction, detection, and parsing of one statement, nothing is saved
+    st.subheader("Profile an Upload")
+    profile_file = st.file_uploader("Statement to profile", accept_multiple_files = False, key = "ProfileFile")
+    if profile_file and st.button("Profile", key = "ProfileUpload"):
+        filepath, report = profile_upload(profile_file.name, profile_file.read())
+        st.code(report)
+        with open(filepath, 'rb') as f:
+            st.download_button("Download profile", f.read(), file_name = os.path.basename(filepath), key = "ProfileDownload")
+        st.caption(f"Saved to `{filepath}`, open with e.g. `snakeviz` or `flameprof`.")
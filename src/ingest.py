@@ -0,0 +1,32 @@
+import os
+import sys
+import time
+import argparse
+
+curr_dir = os.path.dirname(__file__)
+sys.path.append(curr_dir)
+
+from batch_utilities import ingest_folder
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Classify, parse, and save every statement in a folder.")
+    parser.add_argument("folder", help = "directory containing .pdf / .csv statements")
+    parser.add_argument("--workers", type = int, default = None, help = "number of worker processes")
+    args = parser.parse_args()
+    
+    start = time.perf_counter()
+    results = []
+    for result in ingest_folder(args.folder, args.workers):
+        results.append(result)
+        print(f"{result['Seconds']:>8.3f}s  {result['Status']:<20} {result['Reader']:<16} {result['Rows']:>5}  {result['File']}")
+    
+    saved = sum(result["Status"] == "Saved" for result in results)
+    print(f"{saved}/{len(results)} statements saved in {time.perf_counter() - start:.3f}s")
+    pending = sum(result["Status"] == "Needs categories" for result in results)
+    if pending:
+        print(f"{pending} statements need categories: upload them individually in the app (listed under Interrupted Uploads until saved)")
+
+
+if __name__ == '__main__':
+    main()
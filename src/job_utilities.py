@@ -0,0 +1,129 @@
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from decouple import config
+UPLOAD_WORKERS = config('UPLOAD_WORKERS', default = 2, cast = int)
+POLL_INTERVAL = config('POLL_INTERVAL', default = 1.0, cast = float)
+
+curr_dir = os.path.dirname(__file__)
+sys.path.append(curr_dir)
+
+from pdf_utilities import page_progress
+from upload_utilities import process_upload
+from batch_utilities import ingest_batch
+
+
+# shared by every session of the app process, created on the first background job
+executor = None
+
+
+def get_executor():
+    global executor
+    if executor is None:
+        executor = ThreadPoolExecutor(max_workers = UPLOAD_WORKERS, thread_name_prefix = "upload")
+    return executor
+
+
+class Job:
+    '''
+    CLASS OBJECT for work running in the background, which the app polls on each script run.
+    input:
+    - name, what is being processed (e.g. the file name)
+    - unit, name of the items counted by the progress (e.g. pages)
+    - task, function run in the background, called with the job (to report progress) followed by args
+    - args, arguments of the task
+    '''
+    def __init__(self, name, unit, task, *args):
+        self.name = name
+        self.unit = unit
+        self.status = "Queued"
+        self.count, self.total = 0, None
+        self.partial = [] # results available before the job is done
+        self.result, self.error = None, None
+        self.start, self.end = time.perf_counter(), None
+        self.task, self.args = task, args
+        self.future = get_executor().submit(self.run)
+
+
+    def run(self):
+        try:
+            self.result = self.task(self, *self.args)
+            self.status = "Done"
+        except Exception as e:
+            print(e)
+            self.error = e
+            self.status = "Failed"
+        finally:
+            # the job stays in the session after it is done, without the file contents it was given
+            self.task, self.args = None, None
+            self.end = time.perf_counter()
+
+
+    def progress(self, count, total = None):
+        self.count = count
+        self.total = total if total is not None else self.total
+
+
+    def done(self):
+        return self.future.done()
+
+
+    def elapsed(self):
+        return (self.end or time.perf_counter()) - self.start
+
+
+    def fraction(self):
+        return min(self.count/self.total, 1.0) if self.total else 0.0
+
+
+    def describe(self):
+        '''
+        FUNCTION to summarize the job for a progress bar
+        output: text, e.g. "Extracting text: 3/10 pages (1.2s)"
+        '''
+        count = f"{self.count}/{self.total} {self.unit}" if self.total else f"{self.count} {self.unit}"
+        return f"{self.status}: {count} ({self.elapsed():.1f}s)"
+
+
+def upload_task(job, filename, bytes_data, directory):
+    job.status = "Extracting text"
+    statement = process_upload(filename, bytes_data, directory, progress = job.progress)
+    if not statement:
+        return None
+    job.status = "Parsing"
+    with page_progress(job.progress):
+        return statement, statement.get_transactions()
+
+
+def batch_task(job, uploads, directory):
+    job.status = "Processing"
+    job.progress(0, len(uploads))
+    for result in ingest_batch(uploads, directory = directory):
+        job.partial.append(result)
+        job.progress(len(job.partial))
+    return job.partial
+
+
+def submit_upload(filename, bytes_data, directory):
+    '''
+    FUNCTION to read and parse an uploaded statement in the background.
+    input:
+    - filename, name of the statement
+    - bytes_data, contents of the statement
+    - directory, uploads folder of the session the statement is journaled in
+    output: job, whose result is (statement, dataframe of transactions), None if the statement is not recognized
+    '''
+    return Job(filename, "pages", upload_task, filename, bytes_data, directory)
+
+
+def submit_batch(uploads, directory):
+    '''
+    FUNCTION to ingest many statements in the background.
+    input:
+    - uploads, list of (filename, bytes_data) tuples
+    - directory, uploads folder of the session the statements are journaled in
+    output: job, whose partial results are the per-file results of ingest_batch, in order of completion
+    '''
+    return Job(f"{len(uploads)} statements", "statements", batch_task, uploads, directory)
@@ -0,0 +1,180 @@
+import os
+import sys
+from urllib.parse import quote
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from decouple import config
+MASTER_DIRECTORY = config('MASTER_DIRECTORY')
+LEDGER_DIRECTORY = config('LEDGER_DIRECTORY', default = f"{MASTER_DIRECTORY}/data/ledger/")
+
+curr_dir = os.path.dirname(__file__)
+sys.path.append(curr_dir)
+
+from constants import tabs
+from manifest_utilities import update_manifest
+from storage_utilities import locked, load_json, save_json
+
+
+# columns stored in each partition file, tag / Source / month are encoded in the path
+schema = pa.schema([
+    ("Date", pa.date32()),
+    ("Description", pa.string()),
+    ("Amount", pa.float64()),
+    ("Balance", pa.float64()),
+    ("Category", pa.string()),
+    ("File", pa.string())
+])
+partition_schema = pa.schema([
+    ("tag", pa.string()),
+    ("Source", pa.string()),
+    ("month", pa.string())
+])
+
+
+def ledger_files_path(tag):
+    # statements written to the ledger with their size and modification time, pyarrow skips files starting with "_"
+    return os.path.join(LEDGER_DIRECTORY, f"_{tag}.files.json")
+
+
+def record_ledger(tag, written = dict(), removed = []):
+    '''
+    FUNCTION to note which version of each statement the ledger holds.
+    input:
+    - tag, the location tag of the statements
+    - written, dictionary of statement file (relative to data/<tag>/) -> [size, mtime] written to the ledger
+    - removed, list of statement files removed from the ledger
+    '''
+    path = ledger_files_path(tag)
+    with locked(path):
+        entries = load_json(path, default = dict())
+        entries.update(written)
+        for file in removed:
+            entries.pop(file, None)
+        save_json(path, entries)
+
+
+def locate_statement(filepath):
+    '''
+    FUNCTION to split the path of a processed statement into its tag, source, and file.
+    input: filepath, to .csv file in data/<tag>/<source>/
+    output: tag, source, file (relative to data/<tag>/)
+    '''
+    relpath = os.path.relpath(filepath, f"{MASTER_DIRECTORY}/data/").replace(os.sep, "/")
+    tag, file = relpath.split("/", 1)
+    source = file[:file.rfind("/")] if "/" in file else ""
+    return tag, source, file
+
+
+def read_statement(filepath):
+    '''
+    FUNCTION to read a processed statement into the ledger layout.
+    input: filepath, to .csv file in data/<tag>/<source>/
+    output: df, dataframe with columns: Date, Description, Amount, Balance, Category, Source, File
+    '''
+    tag, source, file = locate_statement(filepath)
+    df = pd.read_csv(filepath)
+    df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
+    if "Source" not in df.columns:
+        df["Source"] = source
+    for col in ["Description", "Amount", "Balance", "Category"]:
+        if col not in df.columns:
+            df[col] = None
+    df["Date"] = pd.to_datetime(df["Date"]).dt.date
+    df["Amount"] = df["Amount"].astype("float64")
+    df["Balance"] = df["Balance"].astype("float64")
+    df["Description"] = df["Description"].astype("string")
+    df["Category"] = df["Category"].astype("string")
+    df["File"] = file
+    return df[["Date", "Description", "Amount", "Balance", "Category", "Source", "File"]]
+
+
+def remove_statement(tag, file):
+    '''
+    FUNCTION to delete every partition file written for a statement.
+    input:
+    - tag, the location tag of the statement
+    - file, path of the statement relative to data/<tag>/
+    '''
+    basename = quote(file, safe = "") + ".parquet"
+    for root, dirs, files in os.walk(os.path.join(LEDGER_DIRECTORY, f"tag={tag}")):
+        if basename in files:
+            os.remove(os.path.join(root, basename))
+
+
+def write_statement(filepath):
+    '''
+    FUNCTION to write (or overwrite) a processed statement into the partitioned ledger.
+    input: filepath, to .csv file in data/<tag>/<source>/
+    '''
+    try:
+        import pyarrow.parquet as pq
+        tag, source, file = locate_statement(filepath)
+        stat = os.stat(filepath)
+        df = read_statement(filepath)
+        remove_statement(tag, file)
+
+        # one file per statement in each tag / source / month partition, rows without a date are not partitioned
+        df["month"] = pd.to_datetime(df["Date"]).dt.strftime('%Y-%m')
+        basename = quote(file, safe = "") + ".parquet"
+        for (src, month), part in df.groupby(["Source", "month"], sort = False):
+            directory = os.path.join(LEDGER_DIRECTORY, f"tag={tag}",
+                                     f"Source={quote(str(src), safe = '')}", f"month={month}")
+            os.makedirs(directory, exist_ok = True)
+            table = pa.Table.from_pandas(part[schema.names], schema = schema, preserve_index = False)
+            pq.write_table(table, os.path.join(directory, basename))
+        record_ledger(tag, written = {file: [stat.st_size, stat.st_mtime_ns]})
+    except Exception as e:
+        print(e)
+
+
+def reconcile_ledger(country):
+    '''
+    FUNCTION to bring the ledger of a country in line with its manifest, writing statements added or modified and removing deleted ones.
+    input: country, the subfolder to be loaded
+    '''
+    assert country in list(tabs.keys())
+    tag = tabs[country]['tag']
+    manifest = update_manifest(tag)
+    written = load_json(ledger_files_path(tag), default = dict())
+    for file, entry in manifest.items():
+        if written.get(file) != [entry["size"], entry["mtime"]]:
+            write_statement(f"{MASTER_DIRECTORY}/data/{tag}/{file}")
+    removed = [file for file in written if file not in manifest]
+    for file in removed:
+        remove_statement(tag, file)
+    if removed:
+        record_ledger(tag, removed = removed)
+
+
+def read_ledger(country, period, exclude = ['paystubs.csv']):
+    '''
+    FUNCTION to read transactions within a period from the ledger, only month partitions overlapping the period are opened.
+    input:
+    - country, the subfolder to be searched
+    - period, tuple of (start, end) dates
+    - exclude, a list of files that are to be excluded
+    output: df, dataframe sorted by date with source column
+    '''
+    assert country in list(tabs.keys())
+    tag = tabs[country]['tag']
+    reconcile_ledger(country)
+    os.makedirs(LEDGER_DIRECTORY, exist_ok = True)
+
+    import pyarrow.dataset as ds
+    dataset = ds.dataset(LEDGER_DIRECTORY, schema = pa.unify_schemas([schema, partition_schema]),
+                         format = "parquet", partitioning = ds.partitioning(partition_schema, flavor = "hive"))
+    expression = ((ds.field("tag") == tag) &
+                  (ds.field("month") >= period[0].strftime('%Y-%m')) &
+                  (ds.field("month") <= period[1].strftime('%Y-%m')) &
+                  (ds.field("Date") >= pa.scalar(period[0], type = pa.date32())) &
+                  (ds.field("Date") <= pa.scalar(period[1], type = pa.date32())))
+    columns = ["Date", "Description", "Amount", "Balance", "Category", "Source", "File"]
+    df = dataset.to_table(columns = columns, filter = expression).to_pandas()
+    df = df.where(df.notna(), np.nan) # missing values as NaN, as read from .csv
+
+    df = df.loc[[all(not ff.endswith(ex) for ex in exclude) for ff in df["File"]]]
+    # statement and row order within a date, as read from .csv
+    df = df.sort_values(by = ["Date", "File"], kind = "stable").drop(columns = "File")
+    return df.reset_index(drop = True)
@@ -0,0 +1,167 @@
+import os
+import sys
+from hashlib import sha1
+import pandas as pd
+
+from decouple import config
+MASTER_DIRECTORY = config('MASTER_DIRECTORY')
+
+curr_dir = os.path.dirname(__file__)
+sys.path.append(curr_dir)
+
+from constants import tabs
+from storage_utilities import load_json, save_json
+from profile_utilities import cache_lookup
+
+
+# in-process cache of statements already read: filepath -> (size, mtime, dataframe)
+frames = dict()
+# last compiled master frame per country: (files, dataframe)
+masters = dict()
+
+
+def manifest_path(tag):
+    return f"{MASTER_DIRECTORY}/data/{tag}.manifest.json"
+
+
+def version_path(tag):
+    return f"{MASTER_DIRECTORY}/data/{tag}.version"
+
+
+def ledger_version(country):
+    '''
+    FUNCTION to get the version of a country's data, which changes whenever a statement is saved.
+    input: country, the subfolder of the data
+    output: version, as an integer (0 if nothing has been saved yet)
+    '''
+    try:
+        return os.stat(version_path(tabs[country]['tag'])).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def bump_version(tag):
+    '''
+    FUNCTION to mark a location tag's data as changed, invalidating cached compiled ledgers.
+    input: tag, the location tag of the saved statement
+    '''
+    with open(version_path(tag), 'a'):
+        pass
+    os.utime(version_path(tag))
+
+
+def read_csv_statement(filepath, tag):
+    '''
+    FUNCTION to read a processed .csv statement with a source column and dates.
+    input:
+    - filepath, to .csv file
+    - tag, the location tag of the statement
+    output: df, dataframe of the statement
+    '''
+    df = pd.read_csv(filepath)
+    if "Source" not in df.columns:
+        df["Source"] = filepath[filepath.find(f"{tag}/")+len(tag)+1:filepath.rfind("/")]
+    df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
+    df["Date"] = pd.to_datetime(df["Date"]).dt.date
+    return df
+
+
+def load_statement(filepath, tag, stat):
+    # reuse the frame read earlier in this process if the file is unchanged
+    cached = frames.get(filepath)
+    hit = bool(cached) and cached[:2] == (stat.st_size, stat.st_mtime_ns)
+    cache_lookup("statement frames", hit)
+    if hit:
+        return cached[2]
+    df = read_csv_statement(filepath, tag)
+    frames[filepath] = (stat.st_size, stat.st_mtime_ns, df)
+    return df
+
+
+def update_manifest(tag):
+    '''
+    FUNCTION to bring the manifest of a location tag up to date with the processed statements on disk, re-indexing only files that changed.
+    input: tag, the location tag of the statements
+    output: manifest, dictionary of filepath (relative to data/<tag>/) -> size, mtime, rows, min_date, max_date
+    '''
+    path = f"{MASTER_DIRECTORY}/data/{tag}/"
+    manifest = load_json(manifest_path(tag), default = dict())
+    updated, changed = dict(), False
+    for root, dirs, files in os.walk(path):
+        for ff in files:
+            if ff.endswith('.csv'):
+                filepath = os.path.join(root, ff)
+                relpath = os.path.relpath(filepath, path).replace(os.sep, "/")
+                stat = os.stat(filepath)
+                entry = manifest.get(relpath)
+                
+                # (re-)index new or modified files
+                if not entry or (entry["size"], entry["mtime"]) != (stat.st_size, stat.st_mtime_ns):
+                    df = load_statement(filepath, tag, stat)
+                    dates = df["Date"].dropna()
+                    entry = {"size": stat.st_size,
+                             "mtime": stat.st_mtime_ns,
+                             "rows": df.shape[0],
+                             "min_date": str(min(dates)) if len(dates) else None,
+                             "max_date": str(max(dates)) if len(dates) else None}
+                    changed = True
+                updated[relpath] = entry
+    
+    if changed or set(updated) != set(manifest):
+        save_json(manifest_path(tag), updated)
+    return updated
+
+
+def manifest_signature(manifest):
+    # identifies the statements of a manifest: changes whenever a file is added, removed, or modified
+    return frozenset((relpath, entry["size"], entry["mtime"]) for relpath, entry in manifest.items())
+
+
+def ledger_signature(country):
+    '''
+    FUNCTION to identify the statements of a country, for caches of data compiled from them.
+    Changes whenever a statement is saved (bump_version) or a file is added, removed, or modified outside the app.
+    input: country, the subfolder of the data
+    output: signature, as a hex string
+    '''
+    manifest = update_manifest(tabs[country]['tag'])
+    files = sorted((relpath, entry["size"], entry["mtime"]) for relpath, entry in manifest.items())
+    return sha1(repr((ledger_version(country), files)).encode()).hexdigest()
+
+
+def scan_statements(country, period, exclude = ['paystubs.csv']):
+    '''
+    FUNCTION to collect the statements of a country overlapping a period, re-reading only files that changed since the last compile.
+    input:
+    - country, the subfolder to be searched
+    - period, tuple of (start, end) dates
+    - exclude, a list of files that are to be excluded
+    output: master_df, unfiltered dataframe of all statements overlapping the period
+    '''
+    assert country in list(tabs.keys())
+    tag = tabs[country]['tag']
+    path = f"{MASTER_DIRECTORY}/data/{tag}/"
+    
+    # statements in file order, as in the rollup
+    selected = []
+    for relpath, entry in sorted(update_manifest(tag).items()):
+        # skip excluded files and files without any dates in the period
+        if any(relpath.endswith(ex) for ex in exclude) or entry["min_date"] is None or \
+           entry["max_date"] < str(period[0]) or entry["min_date"] > str(period[1]):
+            continue
+        selected.append((os.path.join(path, relpath), entry))
+    
+    # reuse the master frame if the same unchanged files are selected
+    key = frozenset((filepath, entry["size"], entry["mtime"]) for filepath, entry in selected)
+    hit = country in masters and masters[country][0] == key
+    cache_lookup("master frame", hit)
+    if hit:
+        return masters[country][1]
+    
+    statements = [load_statement(filepath, tag, os.stat(filepath)) for filepath, entry in selected]
+    if statements:
+        master_df = pd.concat(statements)
+    else:
+        master_df = pd.DataFrame(columns = ["Date", "Source"])
+    masters[country] = (key, master_df)
+    return master_df
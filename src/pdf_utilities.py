@@ -1,22 +1,404 @@
-import fitz
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+import sys
 
+from decouple import config
+MASTER_DIRECTORY = config('MASTER_DIRECTORY')
+CACHE_DIRECTORY = config('CACHE_DIRECTORY', default = f"{MASTER_DIRECTORY}/data/cache/")
+CACHE_SIZE = config('CACHE_SIZE', default = 16, cast = int)
+CACHE_DISK_SIZE = config('CACHE_DISK_SIZE', default = 256, cast = int) # documents kept on disk
 
-def extract_text(filepath):
+curr_dir = os.path.dirname(__file__)
+sys.path.append(curr_dir)
+
+from profile_utilities import timed, register_cache
+from storage_utilities import temporary_path
+
+
+class TextCache:
+    '''
+    CLASS OBJECT for content-addressed cache of extracted PDF text.
+    Entries are keyed by the SHA-256 digest of the file bytes and hold the text of each page.
+    The most recently used entries are kept in memory, every entry is also written to disk, where the least recently used are pruned.
+    input:
+    - maxsize, number of documents kept in memory
+    - directory, folder for the on-disk tier (None to disable)
+    - disksize, number of documents kept on disk
+    '''
+    def __init__(self, maxsize = CACHE_SIZE, directory = CACHE_DIRECTORY, disksize = CACHE_DISK_SIZE):
+        self.maxsize = maxsize
+        self.directory = directory
+        self.disksize = disksize
+        self.store = OrderedDict()
+        self.lock = threading.Lock() # uploads of concurrent sessions share the cache
+        self.hits, self.misses = 0, 0
+    
+    
+    def get(self, key):
+        '''
+        FUNCTION to look up a document in memory, then on disk
+        input: key, content hash of the document
+        output: list of page texts, None if not cached
+        '''
+        with self.lock:
+            if key in self.store:
+                self.store.move_to_end(key)
+                self.hits += 1
+                return self.store[key]
+        
+        pages = self.read_disk(key)
+        if pages is not None:
+            with self.lock:
+                self.hits += 1
+            self.remember(key, pages)
+            return pages
+        
+        with self.lock:
+            self.misses += 1
+        return None
+    
+    
+    def put(self, key, pages):
+        '''
+        FUNCTION to add a document to both tiers of the cache
+        input:
+        - key, content hash of the document
+        - pages, list of page texts
+        '''
+        self.remember(key, pages)
+        self.write_disk(key, pages)
+    
+    
+    def remember(self, key, pages):
+        # least recently used entries are evicted first
+        with self.lock:
+            self.store[key] = pages
+            self.store.move_to_end(key)
+            while len(self.store) > self.maxsize:
+                self.store.popitem(last = False)
+    
+    
+    def read_disk(self, key):
+        if not self.directory:
+            return None
+        try:
+            path = os.path.join(self.directory, f"{key}.json")
+            with open(path, encoding = 'utf-8') as f:
+                pages = json.load(f)
+            # modification time tracks the last use, for pruning
+            os.utime(path)
+            return pages
+        except (OSError, ValueError):
+            return None
+    
+    
+    def write_disk(self, key, pages):
+        if not self.directory:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok = True)
+            path = os.path.join(self.directory, f"{key}.json")
+            tmp = temporary_path(path)
+            with open(tmp, 'w', encoding = 'utf-8') as f:
+                json.dump(pages, f)
+            os.replace(tmp, path)
+            self.prune_disk()
+        except OSError as e:
+            print(e)
+    
+    
+    def prune_disk(self):
+        # least recently used documents are removed first, other processes may be pruning too
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                try:
+                    entries.append((os.stat(os.path.join(self.directory, name)).st_mtime_ns, name))
+                except FileNotFoundError:
+                    pass
+        for _, name in sorted(entries)[:max(len(entries) - self.disksize, 0)]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+    
+    
+    def clear(self):
+        with self.lock:
+            self.store.clear()
+            self.hits, self.misses = 0, 0
+    
+    
+    def reset_counters(self):
+        with self.lock:
+            self.hits, self.misses = 0, 0
+
+
+text_cache = TextCache()
+register_cache("pdf text", lambda: (text_cache.hits, text_cache.misses), text_cache.reset_counters)
+digests = dict() # filepath -> (size, mtime, digest)
+local = threading.local() # private text cache and page progress of a thread, if any
+
+
+def current_cache():
+    return getattr(local, "cache", None) or text_cache
+
+
+@contextmanager
+def private_cache():
+    '''
+    FUNCTION to extract text in this thread with an empty, in-memory cache of its own, leaving the shared cache untouched.
+    usage: with private_cache(): text = extract_text(...)
+    '''
+    local.cache = TextCache(directory = None)
+    try:
+        yield local.cache
+    finally:
+        local.cache = None
+
+
+@contextmanager
+def page_progress(progress):
+    '''
+    FUNCTION to report the pages read by iter_pages in this thread, e.g. while a statement reader parses its transactions.
+    usage: with page_progress(progress): df = statement.get_transactions()
+    input: progress, function called with (pages read, total pages) after each page
+    '''
+    local.progress = progress
+    try:
+        yield
+    finally:
+        local.progress = None
+
+
+def hash_bytes(bytes_data):
+    '''
+    FUNCTION to compute the content hash of a file.
+    input: bytes_data, file contents
+    output: hex digest as a string
+    '''
+    return hashlib.sha256(bytes_data).hexdigest()
+
+
+def hash_file(filepath, chunk_size = 1 << 20):
+    '''
+    FUNCTION to compute the content hash of a file on disk, reading it in chunks.
+    Digests are remembered until the file size or modification time changes.
+    input: filepath, to file
+    output: hex digest as a string
+    '''
+    stat = os.stat(filepath)
+    known = digests.get(filepath)
+    if known and known[:2] == (stat.st_size, stat.st_mtime_ns):
+        return known[2]
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    digests[filepath] = (stat.st_size, stat.st_mtime_ns, digest.hexdigest())
+    return digest.hexdigest()
+
+
+def remember_digest(filepath, digest):
+    '''
+    FUNCTION to record the content hash of a file just written from memory, so it is not read back to be hashed.
+    input:
+    - filepath, to the written file
+    - digest, content hash of the bytes written
+    '''
+    stat = os.stat(filepath)
+    digests[filepath] = (stat.st_size, stat.st_mtime_ns, digest)
+
+
+def open_document(filepath = None, bytes_data = None):
+    import fitz
+    if bytes_data is None:
+        return fitz.open(filepath)
+    return fitz.open(stream = bytes_data, filetype = "pdf")
+
+
+@timed("extract")
+def extract_pages(filepath = None, bytes_data = None, progress = None):
+    '''
+    FUNCTION to extract the text of each page of a PDF file, parsing each document at most once.
+    input:
+    - filepath, to pdf file
+    - bytes_data, pdf file contents (read from filepath if not given)
+    - progress, function called with (pages extracted, total pages) after each page
+    output: pages, list of page contents as strings
+    '''
+    try:
+        key = hash_file(filepath) if bytes_data is None else hash_bytes(bytes_data)
+        cache = current_cache()
+        pages = cache.get(key)
+        if pages is None:
+            doc = open_document(filepath, bytes_data)
+            pages = []
+            for page in doc:
+                pages.append(page.get_text())
+                if progress:
+                    progress(len(pages), doc.page_count)
+            doc.close()
+            cache.put(key, pages)
+        elif progress:
+            progress(len(pages), len(pages))
+        return pages
+    except Exception as e:
+        print(e)
+
+
+def extract_first_pages(filepath = None, bytes_data = None, count = 1, progress = None):
+    '''
+    FUNCTION to extract the text of the first pages of a PDF file, without parsing or caching the rest of the document (e.g. to detect the statement type).
+    input:
+    - filepath, to pdf file
+    - bytes_data, pdf file contents (read from filepath if not given)
+    - count, number of pages
+    - progress, function called with (pages extracted, total pages) after each page
+    output: pages, list of page contents as strings
+    '''
+    try:
+        key = hash_file(filepath) if bytes_data is None else hash_bytes(bytes_data)
+        pages = current_cache().get(key)
+        if pages is not None:
+            return pages[:count]
+        
+        doc = open_document(filepath, bytes_data)
+        try:
+            pages = []
+            for ii in range(min(count, doc.page_count)):
+                pages.append(doc[ii].get_text())
+                if progress:
+                    progress(len(pages), doc.page_count)
+            return pages
+        finally:
+            doc.close()
+    except Exception as e:
+        print(e)
+
+
+def extract_text(filepath = None, bytes_data = None, progress = None):
     '''
     FUNCTION to extract text from PDF file.
-    input: filepath, to pdf file
+    input:
+    - filepath, to pdf file
+    - bytes_data, pdf file contents (read from filepath if not given)
+    - progress, function called with (pages extracted, total pages) after each page
     output: text, pdf file contents as a string
     '''
+    pages = extract_pages(filepath, bytes_data, progress)
+    if pages is not None:
+        return "".join(pages)
+
+
+def iter_pages(filepath = None, bytes_data = None):
+    '''
+    FUNCTION to yield the text of a PDF file one page at a time.
+    Pages come from the cache if the document was already extracted, otherwise each page is parsed as it is requested and not kept.
+    Pages read are reported to the progress function of page_progress, if any.
+    input:
+    - filepath, to pdf file
+    - bytes_data, pdf file contents (read from filepath if not given)
+    output: generator of page contents as strings
+    '''
+    progress = getattr(local, "progress", None)
+    key = hash_file(filepath) if bytes_data is None else hash_bytes(bytes_data)
+    pages = current_cache().get(key)
+    if pages is not None:
+        for ii, page in enumerate(pages):
+            if progress:
+                progress(ii+1, len(pages))
+            yield page
+        return
+    
+    doc = open_document(filepath, bytes_data)
     try:
-        doc = fitz.open(filepath)
-        text = ""
-        for page_num in range(doc.page_count):
-            page = doc[page_num]
-            text += page.get_text()
+        for ii, page in enumerate(doc):
+            if progress:
+                progress(ii+1, doc.page_count)
+            yield page.get_text()
+    finally:
         doc.close()
-        return text
-    except Exception as e:
-        print(e)
+
+
+def stream_select_text(pages, before, after, drop_before = None, drop_after = None):
+    '''
+    FUNCTION to select text between two snippets across a stream of pages, removing blocks (e.g. page headers) as each page arrives.
+    Streaming equivalent of invert_select_text(select_text(text, before, after), drop_before, drop_after), only a page and a snippet are buffered at a time.
+    input:
+    - pages, iterable of page contents as strings
+    - before, snippet of text before selection
+    - after, snippet of text after selection
+    - drop_before, snippet of text before each block to be removed (optional)
+    - drop_after, snippet of text after each block to be removed (optional)
+    output: generator of selected text fragments
+    '''
+    # length of tail kept between pages so snippets split across a page break are found
+    tail = max(len(before), len(after), len(drop_before or ""), len(drop_after or "")) - 1
+    buffer, state = "", "before"
+    for page in pages:
+        buffer += page
+        pos = 0 # single left-to-right scan of the buffer
+        while True:
+            if state == "before":
+                start = buffer.find(before, pos)
+                if start < 0:
+                    pos = max(pos, len(buffer)-tail)
+                    break
+                pos = start + len(before)
+                state = "select"
+            
+            elif state == "select":
+                end = buffer.find(after, pos)
+                drop = buffer.find(drop_before, pos) if drop_before else -1
+                if drop >= 0 and (end < 0 or drop < end):
+                    yield buffer[pos:drop]
+                    pos = drop + len(drop_before)
+                    state = "drop"
+                elif end >= 0:
+                    yield buffer[pos:end]
+                    return
+                else:
+                    if len(buffer)-tail > pos:
+                        yield buffer[pos:len(buffer)-tail]
+                        pos = len(buffer)-tail
+                    break
+            
+            else: # state == "drop"
+                end = buffer.find(after, pos)
+                resume = buffer.find(drop_after, pos)
+                if end >= 0 and (resume < 0 or end < resume):
+                    return
+                elif resume >= 0:
+                    pos = resume + len(drop_after)
+                    state = "select"
+                else:
+                    pos = max(pos, len(buffer)-tail)
+                    break
+        buffer = buffer[pos:]
+    
+    # end of document reached before the closing snippet
+    if state == "select":
+        yield buffer
+
+
+def iter_lines(fragments):
+    '''
+    FUNCTION to split a stream of text fragments into lines, same as "".join(fragments).split("\\n")
+    input: fragments, iterable of strings
+    output: generator of lines
+    '''
+    buffer = ""
+    for fragment in fragments:
+        buffer += fragment
+        lines = buffer.split("\n")
+        buffer = lines.pop()
+        yield from lines
+    yield buffer
 
 
 def select_text(text, before, after):
@@ -38,6 +420,46 @@ def select_text(text, before, after):
         print(e)
 
 
+def find_spans(text, before, after):
+    '''
+    FUNCTION to locate every block between two snippets in a single left-to-right scan
+    input:
+    - text, input contents as a string
+    - before, snippet of text at the start of each block
+    - after, snippet of text at the end of each block
+    output: spans, list of (start, end) positions of each block including both snippets
+    '''
+    spans = []
+    pos = 0
+    while True:
+        start = text.find(before, pos)
+        if start < 0:
+            break
+        end = text.find(after, start + len(before))
+        if end < 0:
+            break
+        pos = end + len(after)
+        spans.append((start, pos))
+    return spans
+
+
+def remove_spans(text, spans):
+    '''
+    FUNCTION to remove blocks of text in one pass
+    input:
+    - text, input contents as a string
+    - spans, sorted list of non-overlapping (start, end) positions to be removed
+    output: text without the blocks
+    '''
+    pieces = []
+    pos = 0
+    for start, end in spans:
+        pieces.append(text[pos:start])
+        pos = end
+    pieces.append(text[pos:])
+    return "".join(pieces)
+
+
 def invert_select_text(text, before, after):
     '''
     FUNCTION to invert selection of select_text function
@@ -49,14 +471,6 @@ def invert_select_text(text, before, after):
     '''
     assert len(text) > 0
     try:
-        if text.find(before) < 0 and text.find(after) < 0:
-            return text
-        elif text.find(before) == 0 and text.find(after) >= 0:
-            subtext = text[text.find(after) + len(after):]
-            return invert_select_text(subtext, before, after)
-        else:
-            subtext1 = text[:text.find(before)]
-            subtext2 = text[text.find(after) + len(after):]
-            return invert_select_text(subtext1 + subtext2, before, after)
+        return remove_spans(text, find_spans(text, before, after))
     except Exception as e:
         print(e)
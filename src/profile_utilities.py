@@ -0,0 +1,195 @@
+import os
+import sys
+import time
+import shutil
+import pstats
+import cProfile
+import tempfile
+from io import StringIO
+from functools import wraps
+from collections import defaultdict, deque
+import numpy as np
+import pandas as pd
+
+from decouple import config
+MASTER_DIRECTORY = config('MASTER_DIRECTORY')
+PROFILE_DIRECTORY = config('PROFILE_DIRECTORY', default = f"{MASTER_DIRECTORY}/data/profiles/")
+
+curr_dir = os.path.dirname(__file__)
+sys.path.append(curr_dir)
+
+from storage_utilities import save_bytes
+
+
+# upper edges of the latency histogram buckets, in milliseconds
+buckets = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float("inf")]
+# measurements of this process: stage -> calls, failures, rows, histogram, recent latencies
+stages = defaultdict(lambda: {"calls": 0, "failures": 0, "rows": 0,
+                              "histogram": [0]*len(buckets), "recent": deque(maxlen = 1000)})
+# cache lookups of this process: cache -> [hits, misses]
+caches = defaultdict(lambda: [0, 0])
+# caches that keep their own counters: cache -> function returning (hits, misses)
+cache_counters = dict()
+
+
+def record(stage, seconds, rows = None, failed = False):
+    '''
+    FUNCTION to add one measurement of a stage.
+    input:
+    - stage, name of the stage
+    - seconds, time taken
+    - rows, number of rows (or pages) produced
+    - failed, whether the stage failed or returned nothing
+    '''
+    stats = stages[stage]
+    stats["calls"] += 1
+    stats["failures"] += int(failed)
+    stats["rows"] += rows or 0
+    stats["histogram"][np.searchsorted(buckets, seconds*1000)] += 1
+    stats["recent"].append(seconds*1000)
+
+
+def count_rows(output):
+    try:
+        return len(output)
+    except TypeError:
+        return None
+
+
+class timed:
+    '''
+    CLASS OBJECT for timing a stage, as a decorator or a context manager.
+    input:
+    - stage, name of the stage
+    - count, function of the output giving the rows produced (decorator only)
+    usage: @timed("compile") on a function, or: with timed("chart") as t: ... ; t.rows = n
+    '''
+    def __init__(self, stage, count = count_rows):
+        self.stage = stage
+        self.count = count
+        self.rows = None
+        self.failed = False
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record(self.stage, time.perf_counter() - self.start, self.rows, self.failed or exc_type is not None)
+        return False
+
+    def __call__(self, func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(self.stage) as t:
+                output = func(*args, **kwargs)
+                # functions in this app return None when they fail
+                t.failed = output is None
+                t.rows = self.count(output) if self.count and output is not None else None
+            return output
+        return wrapper
+
+
+def cache_lookup(cache, hit):
+    '''
+    FUNCTION to count a lookup in an in-process cache.
+    input:
+    - cache, name of the cache
+    - hit, whether the lookup was served from the cache
+    '''
+    caches[cache][0 if hit else 1] += 1
+
+
+def register_cache(cache, counter, reset):
+    '''
+    FUNCTION to report a cache that keeps its own hit and miss counters.
+    input:
+    - cache, name of the cache
+    - counter, function returning (hits, misses)
+    - reset, function setting the counters back to zero
+    '''
+    cache_counters[cache] = (counter, reset)
+
+
+def stage_summary():
+    '''
+    FUNCTION to summarize the measurements of every stage.
+    output: dataframe with one row per stage: calls, failures, rows, and latency percentiles (ms)
+    '''
+    rows = []
+    for stage, stats in sorted(stages.items()):
+        recent = np.array(stats["recent"])
+        rows.append({"Stage": stage, "Calls": stats["calls"], "Failures": stats["failures"], "Rows": stats["rows"],
+                     "Mean (ms)": recent.mean(), "p50 (ms)": np.percentile(recent, 50),
+                     "p95 (ms)": np.percentile(recent, 95), "Max (ms)": recent.max()})
+    return pd.DataFrame(rows, columns = ["Stage", "Calls", "Failures", "Rows", "Mean (ms)", "p50 (ms)", "p95 (ms)", "Max (ms)"])
+
+
+def latency_histograms():
+    '''
+    FUNCTION to tabulate the latency histogram of every stage.
+    output: dataframe with one row per latency bucket and one column per stage
+    '''
+    labels = [f"≤ {edge:g} ms" if edge != float("inf") else f"> {buckets[-2]:g} ms" for edge in buckets]
+    return pd.DataFrame({stage: stats["histogram"] for stage, stats in sorted(stages.items())}, index = labels)
+
+
+def cache_summary():
+    '''
+    FUNCTION to summarize the hit rate of every cache.
+    output: dataframe with one row per cache: hits, misses, hit rate
+    '''
+    counts = {cache: tuple(counter()) for cache, (counter, reset) in cache_counters.items()}
+    counts.update({cache: tuple(hm) for cache, hm in caches.items()})
+    rows = [{"Cache": cache, "Hits": hits, "Misses": misses,
+             "Hit Rate": hits/(hits + misses) if hits + misses else np.nan}
+            for cache, (hits, misses) in sorted(counts.items())]
+    return pd.DataFrame(rows, columns = ["Cache", "Hits", "Misses", "Hit Rate"])
+
+
+def reset():
+    stages.clear()
+    caches.clear()
+    for counter, reset_counter in cache_counters.values():
+        reset_counter()
+
+
+def profile_upload(filename, bytes_data, directory = PROFILE_DIRECTORY):
+    '''
+    FUNCTION to profile text extraction, detection, and parsing of an upload, without saving it to the database.
+    input:
+    - filename, name of the statement
+    - bytes_data, contents of the statement
+    - directory, where the profile is written
+    output:
+    - filepath, to the .prof file (pstats format, e.g. for snakeviz or flameprof)
+    - report, the slowest functions by cumulative time as text
+    '''
+    # imported here, the pipeline modules import this module for their timers
+    from pdf_utilities import extract_first_pages, private_cache, digests
+    from reader_registry import detect_statement, DETECT_PAGES
+
+    os.makedirs(directory, exist_ok = True)
+    # the readers parse a file on disk: a temporary copy, removed once profiled
+    upload = os.path.join(tempfile.mkdtemp(prefix = "profile-"), filename)
+
+    # parse from scratch, with a text cache of its own rather than the one shared by the sessions
+    profiler = cProfile.Profile()
+    with private_cache():
+        try:
+            save_bytes(upload, bytes_data)
+            profiler.enable()
+            pages = extract_first_pages(bytes_data = bytes_data, count = DETECT_PAGES) if filename.endswith(".pdf") else []
+            reader = detect_statement(filename, "".join(pages or []))
+            if reader:
+                reader(upload).get_transactions()
+        finally:
+            profiler.disable()
+            shutil.rmtree(os.path.dirname(upload), ignore_errors = True)
+            digests.pop(upload, None)
+
+    filepath = os.path.join(directory, f"{os.path.splitext(filename)[0]}-{time.strftime('%Y%m%d-%H%M%S')}.prof")
+    profiler.dump_stats(filepath)
+    report = StringIO()
+    pstats.Stats(profiler, stream = report).sort_stats("cumulative").print_stats(25)
+    return filepath, report.getvalue()
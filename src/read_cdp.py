@@ -9,13 +9,22 @@ sys.path.append(curr_dir)
 
 from dtype_conversions import str_to_float
 from pdf_utilities import extract_text, select_text
+from reader_registry import register_reader
 
+from decouple import config
+MY_NAME, CDP = config('MY_NAME'), config('CDP')
 
+
+@register_reader(priority = 8)
 class CDPStatement:
     '''
     CLASS OBJECT for CDP Account Statement.
     download instructions: E-Statements >> CDP Securities Account Statements
     '''
+    signatures = ["CDP", MY_NAME, CDP[-4:]]
+    extension = ".pdf"
+    folder = "SG/CDP"
+    
     def __init__(self, filepath):
         self.filepath = filepath
         
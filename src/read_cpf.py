@@ -8,25 +8,32 @@ curr_dir = os.path.dirname(__file__)
 sys.path.append(curr_dir)
 
 from dtype_conversions import str_to_float
-from pdf_utilities import extract_text, select_text, invert_select_text
+from pdf_utilities import iter_pages, stream_select_text, iter_lines
+from reader_registry import register_reader
 
 from decouple import config
-MY_NAME = config('MY_NAME')
+MY_NAME, CPF = config('MY_NAME'), config('CPF')
 
 
+@register_reader(priority = 7)
 class CPFStatement:
     '''
     CLASS OBJECT for Singapore Bank (DBS) Statement.
     input: filepath, to pdf file of bank statement
     '''
+    signatures = ["CPF", MY_NAME, CPF]
+    extension = ".pdf"
+    filename_keyword = "Yearly Statement of Account"
+    folder = "SG/CPF"
+    
     def __init__(self, filepath):
         self.filepath = filepath
     
     
     def get_account_year(self):
         try:
-            text = extract_text(self.filepath)
-            date = select_text(text, "Yearly Statement of Account for ", "\n")
+            # read only as far as the year, near the top of the statement
+            date = "".join(stream_select_text(iter_pages(self.filepath), "Yearly Statement of Account for ", "\n"))
             return date
             
         except Exception as e:
@@ -39,36 +46,34 @@ class CPFStatement:
         output: dataframe with columns: Date, Description, Amount, Balance
         '''
         try:
-            text = extract_text(self.filepath)
-            print(text)
             year = self.get_account_year()
             print(year)
             
             # select table content
             start1 = "MediSave\nAccount ($)\n"
             end1 = "\nSee Appendix"
-            subtext = select_text(text, start1, end1)
-            
-            # remove page-by-page balance carried/brought forward
-            transactions = invert_select_text(subtext, MY_NAME, start1)
             
-            # split by newline
-            data = transactions.split("\n")
-            # data = data[:-3]
-            ii, max_ii = 0, len(data)
+            # remove page-by-page balance carried/brought forward, split by newline
+            transactions = stream_select_text(iter_pages(self.filepath), start1, end1, MY_NAME, start1)
             
-            while ii < max_ii:
+            # five lines to a row, the two lines after a contribution code (CON) are skipped
+            data, row, skip = [], [], 0
+            for x in iter_lines(transactions):
+                if skip:
+                    skip -= 1
+                    continue
                 try:
-                    data[ii] = datetime.strptime(data[ii]+f" {year}", '%d %b %Y')
-                    ii += 1
+                    x = datetime.strptime(x+f" {year}", '%d %b %Y')
                 except:
-                    if data[ii] == "CON":
-                        data.pop(ii+1)
-                        data.pop(ii+1)
-                        max_ii -= 2
-                    ii += 1
+                    if x == "CON":
+                        skip = 2
+                row.append(x)
+                if len(row) == 5:
+                    data.append(row)
+                    row = []
+            if row:
+                raise ValueError(f"incomplete row: {row}")
             
-            data = np.reshape(data, (int(len(data)/5), 5))
             df = pd.DataFrame(columns = ["Date", "Code", "OA", "SA", "MA"], data = data)
             df[["OA","SA","MA"]] = df[["OA","SA","MA"]].applymap(str_to_float)
             df["Balance"] = df.sum(axis = 1)
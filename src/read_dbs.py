@@ -1,4 +1,5 @@
 import os
+import re
 import sys
 from datetime import datetime
 import pandas as pd
@@ -7,18 +8,82 @@ import numpy as np
 curr_dir = os.path.dirname(__file__)
 sys.path.append(curr_dir)
 
-from dtype_conversions import str_to_float
-from pdf_utilities import extract_text, select_text, invert_select_text
+from dtype_conversions import str_to_float, strs_to_floats
+from pdf_utilities import extract_text, select_text, iter_pages, stream_select_text, iter_lines
 from constants import expense_categories
+from reader_registry import register_reader
 
 from decouple import config
-FD = config('FD')
+MY_NAME = config('MY_NAME')
+DBS, FD, SRS = config('DBS'), config('FD'), config('SRS')
 
+# transaction dates as accepted by datetime.strptime(x, '%d/%m/%Y')
+date_pattern = re.compile(r'(3[01]|[12]\d|0[1-9]|[1-9]| [1-9])/(1[0-2]|0[1-9]|[1-9])/(\d{4})')
+
+
+def parse_transactions(data):
+    '''
+    FUNCTION to parse the transaction block of a DBS statement, one line at a time
+    input: data, lines (list or generator) of the transaction block, starting with the balance brought forward
+    output: dataframe with columns: Date, Description, Amount, Balance, Category
+    '''
+    data = iter(data)
+    start_balance = next(data)
+    
+    # each transaction spans from its date to the row before the next date, ending with amount and balance
+    dates, description, amount, balance = [], [], [], []
+    def add_transaction(row):
+        dates.append(row[0])
+        description.append("".join(x + " " for x in row[1:-2]))
+        amount.append(row[-2])
+        balance.append(row[-1])
+    
+    # only the rows of the current transaction are kept: drop balances carried forward and empty lines, convert date rows to datetime
+    row = None
+    for x in data:
+        if not x or 'SGD' in x:
+            continue
+        day = None
+        match = date_pattern.fullmatch(x)
+        if match:
+            try:
+                day = datetime(int(match[3]), int(match[2]), int(match[1]))
+            except ValueError:
+                pass # leave as text
+        if day is not None:
+            if row is not None:
+                add_transaction(row)
+            row = [day]
+        elif row is not None:
+            row.append(x)
+    if row is not None:
+        add_transaction(row)
+    
+    amount = strs_to_floats(amount)
+    balance = strs_to_floats(balance)
+    
+    # direction of each transaction from the change in balance
+    if len(balance):
+        sign = np.sign(np.diff(balance, prepend = str_to_float(start_balance[3:])))
+    else:
+        sign = np.array([])
+    
+    data = np.array((dates, description, sign*amount, balance.tolist())).T
+    df = pd.DataFrame(columns = ['Date','Description','Amount','Balance'], data = data)
+    df["Category"] = (df["Amount"].astype("category").cat.remove_categories(df["Amount"]).cat.add_categories(expense_categories))
+    return df
+
+
+@register_reader(priority = 1)
 class DBSStatement:
     '''
     CLASS OBJECT for Singapore Bank (DBS) Statement.
     input: filepath, to pdf file of bank statement
     '''
+    signatures = ["DBS", MY_NAME, DBS]
+    extension = ".pdf"
+    folder = "SG/DBS"
+    
     def __init__(self, filepath):
         self.filepath = filepath
     
@@ -42,72 +107,32 @@ class DBSStatement:
         output: dataframe with columns: Date, Description, Amount, Balance
         '''
         try:
-            text = extract_text(self.filepath)
-            
             # select transactions in same currency
             start1 = "Balance Brought Forward\n"
             end1 = "\nTotal Balance Carried Forward"
-            subtext = select_text(text, start1, end1)
             
             # remove page-by-page balance carried/brought forward
             start2 = "Balance Carried Forward\n"
             end2 = "\nBalance Brought Forward"
-            transactions = invert_select_text(subtext, start2, end2)
             
-            # split by newline
-            data = transactions.split("\n")
-            start_balance = data[0]
-            data = data[1:]
-            
-            for ii, x in enumerate(data):
-                if 'SGD' in x: # remove balance carried forward
-                    data[ii] = ''
-                try: # convert to transaction date to datetime
-                    data[ii] = datetime.strptime(x, '%d/%m/%Y')
-                except:
-                    pass # leave as text
-            data = [d for d in data if d] # remove empty lines
-            
-            # get index range for each transaction
-            first_idx = [ii for ii, x in enumerate(data) if isinstance(x, datetime)]
-            first_idx.append(len(data))
-            last_idx = [x-2 for x in first_idx if x >= 2]
-            
-            # concatenate text for full description
-            description = []
-            for ii in range(len(last_idx)):
-                desc = ""
-                for jj in range(first_idx[ii]+1, last_idx[ii]):
-                    desc += str(data[jj]) + " "
-                description.append(desc)
-            
-            # get dates, amount, balance for each transaction
-            dates = [x for x in data if isinstance(x, datetime)]
-            amount = [str_to_float(data[ii]) for ii in last_idx]
-            balance = [str_to_float(data[ii+1]) for ii in last_idx]
-            
-            sign = []
-            for ii, bal in enumerate(balance):
-                if ii == 0:
-                    sign.append(np.sign(bal - str_to_float(start_balance[3:])))
-                else:
-                    sign.append(np.sign(bal - balance[ii-1]))
-            
-            # concatenate as a dataframe and append to master
-            data = np.array((dates, description, np.array(sign)*np.array(amount), balance)).T
-            df = pd.DataFrame(columns = ['Date','Description','Amount','Balance'], data = data)
-            df["Category"] = (df["Amount"].astype("category").cat.remove_categories(df["Amount"]).cat.add_categories(expense_categories))
-            return df
+            # stream the statement page by page into transaction rows
+            transactions = stream_select_text(iter_pages(self.filepath), start1, end1, start2, end2)
+            return parse_transactions(iter_lines(transactions))
             
         except Exception as e:
             print(e)
 
 
+@register_reader(priority = 5)
 class FDStatement:
     '''
     CLASS OBJECT for Singapore Bank (DBS) Fixed Deposit (FD) Statement.
     input: filepath, to pdf file of bank statement
     '''
+    signatures = ["Fixed Deposit", MY_NAME, FD]
+    extension = ".pdf"
+    folder = "SG/FD or SRS"
+    
     def __init__(self, filepath):
         self.filepath = filepath
     
@@ -151,11 +176,17 @@ class FDStatement:
             print(e)
 
 
+@register_reader(priority = 4)
 class SRSStatement:
     '''
     CLASS OBJECT for Singapore Bank (DBS) Supplementary Retirement Scheme (SRS) Statement.
+    auto-appends FD balance if detected in statement
     input: filepath, to pdf file of bank statement
     '''
+    signatures = ["Supplementary Retirement Scheme", MY_NAME, SRS]
+    extension = ".pdf"
+    folder = "SG/FD or SRS"
+    
     def __init__(self, filepath):
         self.filepath = filepath
     
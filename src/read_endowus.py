@@ -8,13 +8,23 @@ sys.path.append(curr_dir)
 
 from dtype_conversions import str_to_float
 from pdf_utilities import extract_text, select_text
+from reader_registry import register_reader
 
+from decouple import config
+MY_NAME, Endowus = config('MY_NAME'), config('Endowus')
 
+
+@register_reader(priority = 6)
 class EndowusStatement:
     '''
     CLASS OBJECT for Endowus Investment Statement.
     input: filepath, to pdf file of bank statement
     '''
+    signatures = ["Endowus", MY_NAME, Endowus]
+    extension = ".pdf"
+    filename_prefix = "Endowus"
+    folder = "SG/Endowus"
+    
     def __init__(self, filepath):
         self.filepath = filepath
     
@@ -1,13 +1,31 @@
+import os
+import sys
 from datetime import datetime
 import pandas as pd
 
+curr_dir = os.path.dirname(__file__)
+sys.path.append(curr_dir)
 
+from reader_registry import register_reader
+
+from decouple import config
+IBKR = config('IBKR')
+
+
+@register_reader(priority = 3)
 class IBKRStatement:
     '''
     CLASS OBJECT for Interactive Brokers (IBKR) Statement.
     download instructions: Statements >> MTM Summary >> Monthly
     '''
+    signatures = []
+    extension = ".csv"
+    filename_prefix = IBKR
+    folder = "SG/IBKR"
+    save_raw = False
+    
     def __init__(self, filepath):
+        # path to the statement, or a buffer of its contents when read from an upload
         self.filepath = filepath
         
     def get_transactions(self):
@@ -16,7 +34,9 @@ class IBKRStatement:
         output: dataframe with columns: Date, Balance
         '''
         try:
-            df = pd.read_csv(f"{self.filepath}", on_bad_lines = 'skip')
+            if hasattr(self.filepath, "seek"):
+                self.filepath.seek(0)
+            df = pd.read_csv(self.filepath, on_bad_lines = 'skip')
             date_range = df['Field Value'][df['Field Name'] == "Period"].values[0]
             end_date = datetime.strptime(date_range[date_range.find("-")+2:], '%B %d, %Y')
             balance = float(df['Field Value'][df['Field Name'] == "Ending Value"].values[0])
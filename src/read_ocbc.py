@@ -8,16 +8,25 @@ import sys
 curr_dir = os.path.dirname(__file__)
 sys.path.append(curr_dir)
 
-from pdf_utilities import extract_text, select_text, invert_select_text
+from pdf_utilities import iter_pages, stream_select_text, iter_lines
 from dtype_conversions import str_to_float
 from constants import expense_categories
+from reader_registry import register_reader
 
+from decouple import config
+MY_NAME, OCBC = config('MY_NAME'), config('OCBC')
 
+
+@register_reader(priority = 2)
 class OCBCStatement:
     '''
     CLASS OBJECT for Singapore OCBC Credit Card Statement.
     input: filepath, to pdf file of credit card statement
     '''
+    signatures = ["OCBC 90.N CARD", MY_NAME, OCBC]
+    extension = ".pdf"
+    folder = "SG/OCBC"
+    
     def __init__(self, filepath):
         self.filepath = filepath
         self.expense_categories = [ex for ex in expense_categories if ex != "Credit Card"]
@@ -29,8 +38,8 @@ class OCBCStatement:
         output: statement date in datetime format
         '''
         try:
-            text = extract_text(self.filepath)
-            date = select_text(text, "TOTAL MINIMUM DUE\n", "\n")
+            # read only as far as the date, near the top of the statement
+            date = "".join(stream_select_text(iter_pages(self.filepath), "TOTAL MINIMUM DUE\n", "\n"))
             return datetime.strptime(date, '%d-%m-%Y')
         except Exception as e:
             print(e)
@@ -42,44 +51,23 @@ class OCBCStatement:
         output: dataframe with columns: Date, Description, Amount, Balance
         '''
         try:
-            text = extract_text(self.filepath)
+            sdate = self.get_statement_date()
             
             # select transactions in same currency
             start1 = "LAST MONTH\'S BALANCE\n"
             end1 = "SUBTOTAL\n"
-            subtext = select_text(text, start1, end1)
             
             # remove page-by-page header
             start2 = "\nOCBC Bank"
             end2 = "TRANSACTION DATE\nDESCRIPTION\nAMOUNT (SGD)\n"
-            transactions = invert_select_text(subtext, start2, end2)
             
-            # split by newline
-            data = transactions.split("\n")
-            data = [d for d in data if d] # remove empty lines
-            subtotal = data[-1]
-            data = data[:-1]
-            
-            # concatenate one record, one row
-            for ii, x in enumerate(data):
-                if '/' in x and x[x.find("/")-2:x.find("/")].isnumeric() and x[x.find("/")+1:x.find("/")+3].isnumeric():
-                    idx = ii
-                else:
-                    data[idx] += " " + x
-                    data[ii] = ''
-            data = [d for d in data if d] # remove empty lines
-            
-            dates = [x[x.find("/")-2:x.find("/")+3] for x in data]
-            sdate = self.get_statement_date()
-            for ii, date in enumerate(dates):
-                dd, mm = int(date[0:2]), int(date[3:])
+            dates, description, amount = [], [], []
+            def add_transaction(x):
+                dd, mm = int(x[x.find("/")-2:x.find("/")]), int(x[x.find("/")+1:x.find("/")+3])
                 if mm > sdate.month:
-                    dates[ii] = datetime(sdate.year-1, mm, dd)
+                    dates.append(datetime(sdate.year-1, mm, dd))
                 else:
-                    dates[ii] = datetime(sdate.year, mm, dd)
-            
-            description, amount = [], []
-            for ii, x in enumerate(data):
+                    dates.append(datetime(sdate.year, mm, dd))
                 # if contains parenthesis: credit
                 if x.find("(") >= 0 and x.find(")") >= 0 and x[x.find("(")+1:x.find("(")+2].isnumeric():
                     amount.append(str_to_float(x[x.find("(")+1:x.find(".")+3]))
@@ -89,6 +77,24 @@ class OCBCStatement:
                     amount.append(-1*str_to_float(x[x.find("/")+4:x.find(".")+3]))
                     description.append(x[x.find(".")+4:].replace(' SINGAPORE SGP',''))
             
+            # stream the statement page by page, split by newline, concatenate one record, one row
+            # a line is added once the next one is read, so the last line (the subtotal) is left out
+            transactions = stream_select_text(iter_pages(self.filepath), start1, end1, start2, end2)
+            record, previous = None, None
+            for x in iter_lines(transactions):
+                if not x:
+                    continue # remove empty lines
+                if previous is not None:
+                    if '/' in previous and previous[previous.find("/")-2:previous.find("/")].isnumeric() and previous[previous.find("/")+1:previous.find("/")+3].isnumeric():
+                        if record is not None:
+                            add_transaction(record)
+                        record = previous
+                    else:
+                        record += " " + previous
+                previous = x
+            if record is not None:
+                add_transaction(record)
+            
             # concatenate as a dataframe and append to master
             data = np.array((dates, description, amount)).T
             df = pd.DataFrame(columns = ['Date','Description','Amount'], data = data)
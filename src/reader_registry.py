@@ -0,0 +1,105 @@
+import os
+import sys
+import importlib
+
+from decouple import config
+DETECT_PAGES = config('DETECT_PAGES', default = 2, cast = int)
+
+curr_dir = os.path.dirname(__file__)
+sys.path.append(curr_dir)
+
+from profile_utilities import timed
+
+
+# modules of the statement readers, imported on the first detection
+reader_modules = ["read_dbs", "read_ocbc", "read_ibkr", "read_endowus", "read_cpf", "read_cdp"]
+# registered statement readers as (priority, class), lowest priority is checked first
+readers = []
+matcher = None
+
+
+def register_reader(priority):
+    '''
+    FUNCTION to register a statement reader class for detection.
+    The class declares how its statements are recognized and stored:
+    - signatures, strings that must all appear in the statement (or a list of such lists, any of which may match)
+    - extension, file extension of the statement
+    - folder, subdirectory of data/ where the statement is saved
+    - filename_prefix / filename_keyword, optional checks on the file name
+    - save_raw, whether the original file is saved (True) or only the processed .csv (False)
+    input: priority, order in which readers are checked
+    '''
+    def decorator(cls):
+        global matcher
+        readers.append((priority, cls))
+        readers.sort(key = lambda reader: reader[0])
+        matcher = None # rebuilt with the new signatures on next detection
+        if hasattr(cls, "get_transactions"):
+            cls.get_transactions = timed(f"parse {cls.__name__}")(cls.get_transactions)
+        return cls
+    return decorator
+
+
+def signature_sets(cls):
+    signatures = getattr(cls, "signatures", [])
+    if signatures and all(isinstance(sig, (list, tuple)) for sig in signatures):
+        return signatures
+    return [signatures]
+
+
+class SignatureMatcher:
+    '''
+    CLASS OBJECT to find which of the registered signature strings occur in a text, testing each unique signature once.
+    input: signatures, list of strings to be searched
+    '''
+    def __init__(self, signatures):
+        self.signatures = set(sig for sig in signatures if sig)
+    
+    
+    def match(self, text):
+        '''
+        FUNCTION to find the signatures in a text
+        input: text, input contents as a string (the first DETECT_PAGES pages of a statement)
+        output: found, set of signatures that occur in the text
+        '''
+        return set(sig for sig in self.signatures if sig in text)
+
+
+def load_readers():
+    '''
+    FUNCTION to import the statement reader modules, each registers its readers on import.
+    The readers (and the PDF library) are only loaded once a statement is detected, not at app start.
+    '''
+    for module in reader_modules:
+        importlib.import_module(module)
+
+
+def get_matcher():
+    global matcher
+    if matcher is None:
+        load_readers()
+        matcher = SignatureMatcher([sig for priority, cls in readers
+                                    for sigs in signature_sets(cls) for sig in sigs])
+    return matcher
+
+
+@timed("detect", count = None)
+def detect_statement(filename, text):
+    '''
+    FUNCTION to find the reader for a statement from its file name and contents.
+    input:
+    - filename, name of the statement
+    - text, contents of the first DETECT_PAGES pages of the statement as a string (empty for non-pdf files)
+    output: reader class, None if the statement is not recognized
+    '''
+    found = get_matcher().match(text or "")
+    for priority, cls in readers:
+        if not filename.endswith(getattr(cls, "extension", ".pdf")):
+            continue
+        if not filename.startswith(getattr(cls, "filename_prefix", "")):
+            continue
+        if getattr(cls, "filename_keyword", "") not in filename:
+            continue
+        if any(all(sig in found or not sig for sig in sigs) for sigs in signature_sets(cls)):
+            return cls
+    return None
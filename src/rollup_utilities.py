@@ -0,0 +1,201 @@
+import os
+import sys
+import calendar
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+
+from decouple import config
+MASTER_DIRECTORY = config('MASTER_DIRECTORY')
+
+curr_dir = os.path.dirname(__file__)
+sys.path.append(curr_dir)
+
+from constants import expense_categories, tabs
+from manifest_utilities import read_csv_statement, update_manifest, manifest_signature
+from profile_utilities import cache_lookup
+from storage_utilities import save_csv
+
+
+columns = ["File", "Size", "Mtime", "Month", "Source", "Category", "Sum", "Count",
+           "MinBalance", "MaxBalance", "LastDate", "LastRow", "LastBalance"]
+# rollups read in this process: tag -> (statements, dataframe)
+rollups = dict()
+
+
+def rollup_path(tag):
+    return f"{MASTER_DIRECTORY}/data/{tag}.rollup.csv"
+
+
+def statement_file(filepath, tag):
+    return os.path.relpath(filepath, f"{MASTER_DIRECTORY}/data/{tag}/").replace(os.sep, "/")
+
+
+def summarize_statement(filepath, tag):
+    '''
+    FUNCTION to aggregate a processed statement by month, source, and category.
+    input:
+    - filepath, to .csv file
+    - tag, the location tag of the statement
+    output: dataframe with columns: File, Size, Mtime, Month, Source, Category, Sum, Count, MinBalance, MaxBalance, LastDate, LastRow, LastBalance
+    '''
+    stat = os.stat(filepath)
+    df = read_csv_statement(filepath, tag)
+    for col in ["Amount", "Balance", "Category"]:
+        if col not in df.columns:
+            df[col] = np.nan
+    # position in the statement, so balances recorded on the same date are ordered as in the statement
+    df["Row"] = np.arange(df.shape[0])
+    df = df[~df["Date"].isna()].sort_values(by = "Date", kind = "stable")
+    df["Month"] = [d.strftime('%Y-%m') for d in df["Date"]]
+
+    groups = df.groupby(["Month", "Source", "Category"], dropna = False)
+    summary = groups.agg(Sum = ("Amount", "sum"), Count = ("Amount", "count"),
+                         MinBalance = ("Balance", "min"), MaxBalance = ("Balance", "max"))
+
+    # last recorded balance of each group
+    balances = df[~df["Balance"].isna()].groupby(["Month", "Source", "Category"], dropna = False)
+    summary = summary.join(balances.agg(LastDate = ("Date", "last"), LastRow = ("Row", "last"),
+                                       LastBalance = ("Balance", "last")))
+
+    summary = summary.reset_index()
+    summary["File"] = statement_file(filepath, tag)
+    summary["Size"], summary["Mtime"] = stat.st_size, stat.st_mtime_ns
+    return summary[columns]
+
+
+def read_rollup(tag):
+    # rollup saved on disk, empty if it is missing or was saved without file sizes and modification times
+    try:
+        rollup = pd.read_csv(rollup_path(tag), dtype = {"Month": str})
+    except (OSError, ValueError):
+        return pd.DataFrame(columns = columns)
+    return rollup if set(columns) <= set(rollup.columns) else pd.DataFrame(columns = columns)
+
+
+def reconcile_rollup(tag, manifest):
+    '''
+    FUNCTION to bring the rollup of a location tag in line with its manifest, re-aggregating only statements that were added or modified.
+    input:
+    - tag, the location tag of the statements
+    - manifest, from update_manifest
+    output: rollup, dataframe of aggregates per statement, month, source, and category
+    '''
+    rollup = read_rollup(tag)
+    files = rollup.drop_duplicates("File").set_index("File")[["Size", "Mtime"]]
+    # statements without any dates have no aggregates
+    current = {relpath: (files.loc[relpath, "Size"], files.loc[relpath, "Mtime"]) == (entry["size"], entry["mtime"])
+               if relpath in files.index else entry["min_date"] is None for relpath, entry in manifest.items()}
+    if all(current.values()) and set(files.index) <= set(manifest):
+        return rollup
+
+    summaries = [rollup[rollup["File"].map(current).fillna(False).astype(bool)]]
+    for relpath in [relpath for relpath in manifest if not current[relpath]]:
+        summaries.append(summarize_statement(f"{MASTER_DIRECTORY}/data/{tag}/{relpath}", tag))
+    rollup = pd.concat(summaries)[columns]
+    save_csv(rollup, rollup_path(tag), index = False)
+    return rollup
+
+
+def update_rollup(filepath, tag):
+    '''
+    FUNCTION to replace the aggregates of a saved statement in the rollup.
+    input:
+    - filepath, to the saved .csv file
+    - tag, the location tag of the statement
+    '''
+    try:
+        rollup = read_rollup(tag)
+        rollup = rollup[rollup["File"] != statement_file(filepath, tag)]
+        rollup = pd.concat([rollup, summarize_statement(filepath, tag)])
+        save_csv(rollup, rollup_path(tag), index = False)
+    except Exception as e:
+        print(e)
+
+
+def load_rollup(country, exclude = ['paystubs.csv']):
+    '''
+    FUNCTION to read the rollup of a country, re-aggregating statements added or modified since it was saved.
+    input:
+    - country, the subfolder of the data
+    - exclude, a list of files that are to be excluded
+    output: rollup, dataframe of aggregates per month, source, and category
+    '''
+    assert country in list(tabs.keys())
+    try:
+        tag = tabs[country]['tag']
+        manifest = update_manifest(tag)
+        signature = manifest_signature(manifest)
+        cache_lookup("rollup", tag in rollups and rollups[tag][0] == signature)
+        if tag not in rollups or rollups[tag][0] != signature:
+            rollup = reconcile_rollup(tag, manifest)
+            rollup["LastDate"] = pd.to_datetime(rollup["LastDate"]).dt.date
+            rollups[tag] = (signature, rollup)
+        rollup = rollups[tag][1]
+        return rollup[[all(not ff.endswith(ex) for ex in exclude) for ff in rollup["File"]]]
+    except Exception as e:
+        print(e)
+
+
+def month_aligned(period):
+    '''
+    FUNCTION to check if a period covers whole months, so it can be answered from monthly aggregates.
+    input: period, tuple of (start, end) dates
+    output: bool
+    '''
+    month_end = calendar.monthrange(period[1].year, period[1].month)[1]
+    return period[0].day == 1 and (period[1].day == month_end or period[1] >= date.today())
+
+
+def rollup_category_table(rollup, period, freq = None):
+    '''
+    FUNCTION to create expense category table from the rollup, same output as category_table.
+    input:
+    - rollup, dataframe from load_rollup
+    - period, tuple of (start, end) dates
+    - freq, 'M' for one row per month, one row for the whole period if None
+    output: output_df, the output dataframe, None if the period does not cover whole months
+    '''
+    try:
+        if rollup is None or not month_aligned(period) or freq not in [None, 'M']:
+            return None
+        categories = sorted(cat for cat in expense_categories if cat != "Credit Card") # remove credit card payments
+        months = rollup["Month"]
+        expenses = rollup.loc[rollup["Category"].isin(categories) &
+                              (months >= period[0].strftime('%Y-%m')) & (months <= period[1].strftime('%Y-%m'))]
+
+        if freq is None:
+            index = [f"{datetime.strftime(period[0], '%d %b %Y')} to {datetime.strftime(period[1], '%d %b %Y')}"]
+            labels = pd.Series(index[0], index = expenses.index)
+        else:
+            index = pd.period_range(period[0], period[1], freq = freq).astype(str)
+            labels = expenses["Month"]
+
+        totals = expenses.groupby([labels, expenses["Category"]])["Sum"].sum().unstack()
+        output_df = (-1*totals).reindex(index = index, columns = categories, fill_value = 0)
+        output_df = output_df.fillna(0).astype("float64").rename_axis(index = None, columns = None)
+        return output_df
+    except Exception as e:
+        print(e)
+
+
+def rollup_balance_table(rollup, ffill = True):
+    '''
+    FUNCTION to get account balance timeseries from the rollup, same output as balance_table.
+    input:
+    - rollup, dataframe from load_rollup
+    - ffill, whether months without a statement carry the last recorded balance of each source forward
+    output: output_df, month-end balances with one column per source
+    '''
+    try:
+        # latest balance of each month, balances recorded on the same date ordered as in their statement
+        balances = rollup[~rollup["LastBalance"].isna()].sort_values(by = ["LastDate", "File", "LastRow"], kind = "stable")
+        latest = balances.groupby(["Month", "Source"])["LastBalance"].last().unstack("Source")
+        latest.index = pd.to_datetime(latest.index) + pd.offsets.MonthEnd(0)
+        latest.index.name = "Date"
+        output_df = latest.dropna(how = 'all').sort_index()
+        if ffill:
+            output_df = output_df.ffill()
+        return output_df
+    except Exception as e:
+        print(e)
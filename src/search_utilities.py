@@ -0,0 +1,203 @@
+import os
+import re
+import sys
+from bisect import bisect_left
+from urllib.parse import quote, unquote
+import pandas as pd
+
+from decouple import config
+MASTER_DIRECTORY = config('MASTER_DIRECTORY')
+
+curr_dir = os.path.dirname(__file__)
+sys.path.append(curr_dir)
+
+from constants import tabs
+from storage_utilities import load_json, save_json
+from manifest_utilities import load_statement, update_manifest, manifest_signature
+from rollup_utilities import statement_file
+from profile_utilities import timed, cache_lookup
+
+
+columns = ["Date", "Source", "Description", "Amount", "Category"]
+# search shards read in this process: tag -> {statement file: shard}
+shards = dict()
+# search indexes built in this process: tag -> (statements, exclude, index)
+indexes = dict()
+
+
+def shard_directory(tag):
+    return f"{MASTER_DIRECTORY}/data/{tag}.search"
+
+
+def shard_path(tag, file):
+    # one shard per statement, so saving a statement rewrites only its own postings
+    return os.path.join(shard_directory(tag), quote(file, safe = "") + ".json")
+
+
+def tokenize(text):
+    '''
+    FUNCTION to split a description into lowercase alphanumeric tokens.
+    input: text, the description
+    output: list of tokens
+    '''
+    return re.findall(r"[a-z0-9]+", str(text).lower())
+
+
+def index_statement(filepath, tag):
+    '''
+    FUNCTION to create the search shard of a processed statement.
+    input:
+    - filepath, to .csv file
+    - tag, the location tag of the statement
+    output: shard, dictionary of the size and modification time of the statement, and its postings (token -> row numbers in the statement)
+    '''
+    stat = os.stat(filepath)
+    df = load_statement(filepath, tag, stat)
+    postings = dict()
+    if "Description" in df.columns:
+        for i, (day, description) in enumerate(zip(df["Date"], df["Description"])):
+            if pd.isna(day) or pd.isna(description):
+                continue
+            for token in set(tokenize(description)):
+                postings.setdefault(token, []).append(i)
+    return {"size": stat.st_size, "mtime": stat.st_mtime_ns, "postings": postings}
+
+
+def update_search_index(filepath, tag):
+    '''
+    FUNCTION to replace the search shard of a saved statement.
+    input:
+    - filepath, to the saved .csv file
+    - tag, the location tag of the statement
+    '''
+    try:
+        save_json(shard_path(tag, statement_file(filepath, tag)), index_statement(filepath, tag))
+    except Exception as e:
+        print(e)
+
+
+def reconcile_search_index(tag, manifest):
+    '''
+    FUNCTION to bring the search shards of a location tag in line with its manifest, re-indexing only statements that were added or modified.
+    input:
+    - tag, the location tag of the statements
+    - manifest, from update_manifest
+    output: dictionary of statement file -> shard
+    '''
+    known = shards.setdefault(tag, dict())
+    for file, entry in manifest.items():
+        version = (entry["size"], entry["mtime"])
+        shard = known.get(file)
+        if shard is None or (shard["size"], shard["mtime"]) != version:
+            shard = load_json(shard_path(tag, file))
+            if shard is None or (shard["size"], shard["mtime"]) != version:
+                shard = index_statement(f"{MASTER_DIRECTORY}/data/{tag}/{file}", tag)
+                save_json(shard_path(tag, file), shard)
+            known[file] = shard
+
+    # shards of deleted statements
+    for file in set(known) - set(manifest):
+        del known[file]
+    if os.path.isdir(shard_directory(tag)):
+        for name in os.listdir(shard_directory(tag)):
+            if name.endswith(".json") and unquote(name[:-len(".json")]) not in manifest:
+                os.remove(os.path.join(shard_directory(tag), name))
+    return known
+
+
+class SearchIndex:
+    '''
+    CLASS OBJECT for the inverted index of transaction descriptions, supporting prefix search.
+    Postings point to (statement file, row number), matching rows are read from the statements.
+    input:
+    - tag, the location tag of the statements
+    - shards, dictionary of statement file -> shard
+    - exclude, a list of files that are to be excluded
+    '''
+    def __init__(self, tag, shards, exclude = []):
+        self.tag = tag
+        self.postings = dict()
+        for file, shard in shards.items():
+            if any(file.endswith(ex) for ex in exclude):
+                continue
+            for token, rows in shard["postings"].items():
+                self.postings.setdefault(token, []).extend((file, i) for i in rows)
+        self.vocabulary = sorted(self.postings)
+
+    def lookup(self, prefix):
+        '''
+        FUNCTION to find the rows with a token starting with prefix.
+        input: prefix, lowercase token prefix
+        output: set of (statement file, row number)
+        '''
+        ids = set()
+        for i in range(bisect_left(self.vocabulary, prefix), len(self.vocabulary)):
+            if not self.vocabulary[i].startswith(prefix):
+                break
+            ids.update(self.postings[self.vocabulary[i]])
+        return ids
+
+    def search(self, query):
+        '''
+        FUNCTION to find the transactions matching every word of a query, each as a prefix.
+        input: query, the search text
+        output: df, matching transactions sorted by date
+        '''
+        ids = None
+        for token in sorted(set(tokenize(query)), key = len, reverse = True):
+            ids = self.lookup(token) if ids is None else ids & self.lookup(token)
+            if not ids:
+                break
+
+        # read only the statements with a match
+        rows = dict()
+        for file, i in sorted(ids or []):
+            rows.setdefault(file, []).append(i)
+        frames = []
+        for file, ii in rows.items():
+            filepath = f"{MASTER_DIRECTORY}/data/{self.tag}/{file}"
+            frames.append(load_statement(filepath, self.tag, os.stat(filepath)).iloc[ii].reindex(columns = columns))
+        df = pd.concat(frames) if frames else pd.DataFrame(columns = columns)
+        df = df.astype(object).where(df.notna(), None)
+        df["Amount"] = df["Amount"].astype("float64")
+        return df.sort_values(by = "Date", kind = "stable").reset_index(drop = True)
+
+
+def load_search_index(country, exclude = ['paystubs.csv']):
+    '''
+    FUNCTION to get the search index of a country, re-indexing statements added or modified since it was built.
+    input:
+    - country, the subfolder of the data
+    - exclude, a list of files that are to be excluded
+    output: index, SearchIndex object
+    '''
+    assert country in list(tabs.keys())
+    tag = tabs[country]['tag']
+    manifest = update_manifest(tag)
+    signature = manifest_signature(manifest)
+    cache_lookup("search index", tag in indexes and indexes[tag][:2] == (signature, tuple(exclude)))
+    if tag not in indexes or indexes[tag][:2] != (signature, tuple(exclude)):
+        indexes[tag] = (signature, tuple(exclude), SearchIndex(tag, reconcile_search_index(tag, manifest), exclude))
+    return indexes[tag][2]
+
+
+@timed("search")
+def search_transactions(country, query, period = None, categories = None):
+    '''
+    FUNCTION to search transaction descriptions of a country.
+    input:
+    - country, the subfolder of the data
+    - query, the search text, every word is matched as a prefix of a description word
+    - period, tuple of (start, end) dates (all dates if None)
+    - categories, list of categories to be selected (all if None)
+    output: df, matching transactions sorted by date
+    '''
+    try:
+        df = load_search_index(country).search(query)
+        if period is not None:
+            df = df.loc[(df["Date"] >= period[0]) & (df["Date"] <= period[1])]
+        if categories is not None:
+            df = df.loc[df["Category"].isin(categories)]
+        return df.reset_index(drop = True)
+    except Exception as e:
+        print(e)
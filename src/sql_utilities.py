@@ -0,0 +1,121 @@
+import os
+import sys
+import sqlite3
+from contextlib import closing
+import pandas as pd
+
+from decouple import config
+MASTER_DIRECTORY = config('MASTER_DIRECTORY')
+LEDGER_DATABASE = config('LEDGER_DATABASE', default = f"{MASTER_DIRECTORY}/data/ledger.db")
+
+curr_dir = os.path.dirname(__file__)
+sys.path.append(curr_dir)
+
+from constants import tabs
+from ledger_utilities import read_statement, locate_statement
+from manifest_utilities import update_manifest
+
+
+schema = '''
+CREATE TABLE IF NOT EXISTS transactions (
+    tag TEXT NOT NULL,
+    file TEXT NOT NULL,
+    date TEXT NOT NULL,
+    description TEXT,
+    amount REAL,
+    balance REAL,
+    category TEXT,
+    source TEXT
+);
+CREATE INDEX IF NOT EXISTS transactions_tag_date ON transactions (tag, date);
+CREATE INDEX IF NOT EXISTS transactions_category_date ON transactions (category, date);
+CREATE INDEX IF NOT EXISTS transactions_file ON transactions (tag, file);
+CREATE TABLE IF NOT EXISTS statements (
+    tag TEXT NOT NULL,
+    file TEXT NOT NULL,
+    size INTEGER,
+    mtime INTEGER,
+    PRIMARY KEY (tag, file)
+);
+'''
+
+
+def connect():
+    '''
+    FUNCTION to open the ledger database, creating tables and indexes if needed.
+    output: sqlite3 connection
+    '''
+    os.makedirs(os.path.dirname(LEDGER_DATABASE), exist_ok = True)
+    connection = sqlite3.connect(LEDGER_DATABASE)
+    connection.executescript(schema)
+    return connection
+
+
+def insert_statement(connection, filepath):
+    # replace all rows previously loaded from the same statement, noting the version of the statement loaded
+    tag, source, file = locate_statement(filepath)
+    stat = os.stat(filepath)
+    df = read_statement(filepath)
+    df = df.astype(object).where(df.notna(), None)
+    connection.execute("DELETE FROM transactions WHERE tag = ? AND file = ?", (tag, file))
+    connection.executemany(
+        "INSERT INTO transactions (tag, file, date, description, amount, balance, category, source) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [(tag, file, str(row.Date), row.Description, row.Amount, row.Balance, row.Category, row.Source)
+         for row in df.itertuples(index = False) if row.Date is not None])
+    connection.execute("INSERT OR REPLACE INTO statements (tag, file, size, mtime) VALUES (?, ?, ?, ?)",
+                       (tag, file, stat.st_size, stat.st_mtime_ns))
+
+
+def sync_statement(filepath):
+    '''
+    FUNCTION to load (or reload) a saved statement into the ledger database.
+    input: filepath, to .csv file in data/<tag>/<source>/
+    '''
+    try:
+        with closing(connect()) as connection, connection:
+            insert_statement(connection, filepath)
+    except Exception as e:
+        print(e)
+
+
+def ingest_tree(connection, tag):
+    # bring the database in line with the manifest: load statements added or modified, drop deleted ones
+    manifest = update_manifest(tag)
+    loaded = {file: (size, mtime) for file, size, mtime in
+              connection.execute("SELECT file, size, mtime FROM statements WHERE tag = ?", (tag,))}
+    for file, entry in manifest.items():
+        if loaded.get(file) != (entry["size"], entry["mtime"]):
+            insert_statement(connection, f"{MASTER_DIRECTORY}/data/{tag}/{file}")
+    for file in set(loaded) - set(manifest):
+        connection.execute("DELETE FROM transactions WHERE tag = ? AND file = ?", (tag, file))
+        connection.execute("DELETE FROM statements WHERE tag = ? AND file = ?", (tag, file))
+
+
+def query_ledger(country, period, categories = None, exclude = ['paystubs.csv']):
+    '''
+    FUNCTION to query transactions from the ledger database using its (tag, date) and (category, date) indexes.
+    input:
+    - country, the subfolder to be queried
+    - period, tuple of (start, end) dates
+    - categories, list of categories to be selected (all if None)
+    - exclude, a list of files that are to be excluded
+    output: df, dataframe sorted by date with source column
+    '''
+    assert country in list(tabs.keys())
+    tag = tabs[country]['tag']
+    with closing(connect()) as connection, connection:
+        ingest_tree(connection, tag)
+
+        query = "SELECT date, description, amount, balance, category, source, file FROM transactions WHERE tag = ? AND date BETWEEN ? AND ?"
+        params = [tag, str(period[0]), str(period[1])]
+        if categories is not None:
+            query += f" AND category IN ({', '.join('?' for cat in categories)})"
+            params += list(categories)
+        query += " ORDER BY date, file, rowid" # statement and row order within a date
+        df = pd.read_sql_query(query, connection, params = params)
+
+    df.columns = ["Date", "Description", "Amount", "Balance", "Category", "Source", "File"]
+    df = df.loc[[all(not ff.endswith(ex) for ex in exclude) for ff in df["File"]]]
+    df["Date"] = pd.to_datetime(df["Date"]).dt.date
+    df = df.where(df.notna(), float("nan")) # missing values as NaN, as read from .csv
+    return df.drop(columns = "File").reset_index(drop = True)
@@ -0,0 +1,135 @@
+import os
+import json
+import threading
+from hashlib import sha1
+from contextlib import contextmanager
+try:
+    import fcntl
+except ImportError: # not available on Windows, writes are then atomic but not locked
+    fcntl = None
+
+from decouple import config
+MASTER_DIRECTORY = config('MASTER_DIRECTORY')
+UPLOAD_DIRECTORY = f"{MASTER_DIRECTORY}/data/uploads"
+# lock files are kept out of data/, which is listed and walked for statements
+LOCK_DIRECTORY = config('LOCK_DIRECTORY', default = f"{MASTER_DIRECTORY}/locks")
+
+
+def temporary_path(path):
+    # unique per process and thread, so concurrent writers of the same file never share a temporary file
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+@contextmanager
+def locked(path):
+    '''
+    FUNCTION to hold an exclusive lock while reading and rewriting a file, across threads and processes.
+    input: path, of the file to be locked (the lock is held on a file named after it in LOCK_DIRECTORY)
+    usage: with locked(path): entries = load_json(path); ...; save_json(path, entries)
+    '''
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(LOCK_DIRECTORY, exist_ok = True)
+    name = f"{os.path.basename(path)}.{sha1(os.path.abspath(path).encode()).hexdigest()[:12]}.lock"
+    with open(os.path.join(LOCK_DIRECTORY, name), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def load_json(path, default = None):
+    '''
+    FUNCTION to read a json file, falling back to a default if it is missing or corrupt.
+    input:
+    - path, to json file
+    - default, value returned if the file cannot be read
+    output: parsed contents of the file
+    '''
+    try:
+        with open(path, encoding = 'utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def save_json(path, obj):
+    '''
+    FUNCTION to write a json file atomically so readers never see a partial file.
+    input:
+    - path, to json file
+    - obj, json-serializable contents
+    '''
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        tmp = temporary_path(path)
+        with open(tmp, 'w', encoding = 'utf-8') as f:
+            json.dump(obj, f)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(e)
+
+
+def save_bytes(path, bytes_data):
+    '''
+    FUNCTION to write a file atomically so readers never see a partial file.
+    input:
+    - path, to file
+    - bytes_data, file contents
+    '''
+    tmp = temporary_path(path)
+    with open(tmp, 'wb') as f:
+        f.write(bytes_data)
+    os.replace(tmp, path)
+
+
+def save_csv(df, path, **kwargs):
+    '''
+    FUNCTION to write a dataframe as a .csv file atomically so readers never see a partial file.
+    input:
+    - df, the dataframe
+    - path, to .csv file
+    - kwargs, passed to DataFrame.to_csv
+    '''
+    tmp = temporary_path(path)
+    df.to_csv(tmp, **kwargs)
+    os.replace(tmp, path)
+
+
+def session_id():
+    '''
+    FUNCTION to identify the Streamlit session running this thread.
+    output: session id, "local" outside of a Streamlit session (e.g. batch scripts)
+    '''
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx(suppress_warning = True)
+        return ctx.session_id if ctx else "local"
+    except ImportError:
+        return "local"
+
+
+def active_session(session):
+    '''
+    FUNCTION to check if a Streamlit session is still connected to this app, so its uploads are in progress rather than interrupted.
+    input: session, session id
+    output: bool, False outside of a Streamlit app
+    '''
+    try:
+        from streamlit import runtime
+        return runtime.exists() and runtime.get_instance().is_active_session(session)
+    except ImportError:
+        return False
+
+
+def staging_directory(session = None):
+    '''
+    FUNCTION to get the uploads folder of a session, so sessions never read or clear each other's uploads.
+    input: session, session id (the current Streamlit session if None)
+    output: path to data/uploads/<session>/
+    '''
+    path = f"{UPLOAD_DIRECTORY}/{session or session_id()}"
+    os.makedirs(path, exist_ok = True)
+    return path
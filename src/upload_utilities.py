@@ -1,41 +1,28 @@
 import os
+import io
 import sys
+import time
 import pandas as pd
 
 from decouple import config
 MASTER_DIRECTORY = config('MASTER_DIRECTORY')
-MY_NAME = config('MY_NAME')
-DBS, OCBC, IBKR, Endowus = config('DBS'), config('OCBC'), config('IBKR'), config('Endowus')
-FD, SRS = config('FD'), config('SRS')
-CPF, CDP = config('CPF'), config('CDP')
+LEDGER_ENGINE = config('LEDGER_ENGINE', default = 'csv')
 
 curr_dir = os.path.dirname(__file__)
 sys.path.append(curr_dir)
 
-from pdf_utilities import extract_text
-from read_dbs import DBSStatement, SRSStatement, FDStatement
-from read_ocbc import OCBCStatement
-from read_ibkr import IBKRStatement
-from read_endowus import EndowusStatement
-from read_cpf import CPFStatement
-from read_cdp import CDPStatement
+from pdf_utilities import extract_first_pages, hash_bytes, hash_file, remember_digest
+# statement readers are imported by the registry on first detection
+from reader_registry import detect_statement, DETECT_PAGES
 from constants import expense_categories
-
-
-def clear_directory(path = f"{MASTER_DIRECTORY}/data/uploads/"):
-    '''
-    FUNCTION to clear the uploads folder.
-    '''
-    try:
-        os.chdir(path)
-        path = os.getcwd()
-        
-        filelist = []
-        for root, dirs, files in os.walk(path):
-            for ff in files:
-                os.remove(os.path.join(root,ff))
-    except Exception as e:
-        print(e)
+from ledger_utilities import write_statement, locate_statement
+from sql_utilities import sync_statement
+from manifest_utilities import bump_version
+from rollup_utilities import update_rollup
+from search_utilities import update_search_index
+from duplicate_utilities import update_fingerprints
+from filesystem_utilities import find_files, add_file, find_upload, record_upload
+from storage_utilities import UPLOAD_DIRECTORY, locked, load_json, save_json, save_bytes, save_csv, staging_directory, active_session
 
 
 def list_files(directory = f"{MASTER_DIRECTORY}/data/"):
@@ -45,10 +32,8 @@ def list_files(directory = f"{MASTER_DIRECTORY}/data/"):
     output: list of files
     '''
     try:
-        os.chdir(directory)
-        path = os.getcwd()
         filelist = []
-        for root, dirs, files in os.walk(path):
+        for root, dirs, files in os.walk(directory):
             for ff in files:
                 filelist.append(os.path.join(root,ff))
         return filelist
@@ -56,23 +41,32 @@ def list_files(directory = f"{MASTER_DIRECTORY}/data/"):
         print(e)
     
     
-def search_data(filename):
+def search_data(filename, bytes_data = None):
     '''
     FUNCTION to search if a file is already in database and if a pre-processed version can be used.
-    input: filename, name of file to be searched
+    input:
+    - filename, name of file to be searched
+    - bytes_data, contents of the file, if given a statement saved under another name is also found
     output:
     - bool, True if found, False if not found
     - df, dataframe of pre-processed data if found, empty dataframe if not found
     '''
     try:
+        # search for the statement by its contents, e.g. a renamed download
+        if bytes_data is not None:
+            filepath = find_upload(hash_bytes(bytes_data))
+            if filepath:
+                df = pd.read_csv(filepath)
+                df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
+                return True, df
+        
         # search for filename with .csv extension
         if "." in filename:
-            file = '/' + filename[:filename.rfind(".")] + '.csv'
+            file = filename[:filename.rfind(".")] + '.csv'
         else:
-            file = '/' + filename + '.csv'
+            file = filename + '.csv'
         
-        filelist = list_files(f"{MASTER_DIRECTORY}/data/")
-        idx = [ff for ff in filelist if file in ff]
+        idx = find_files(file)
         
         # if a single file found, return True and dataframe
         if idx and len(idx) == 1:
@@ -87,88 +81,109 @@ def search_data(filename):
         print(e)
     
 
-def process_upload(filename, bytes_data):
+def process_upload(filename, bytes_data, directory = None, progress = None):
     '''
     FUNCTION to read uploaded document and assign location to save data.
-    input: filename, name of file that was uploaded by user on frontend
+    input:
+    - filename, name of file that was uploaded by user on frontend
+    - bytes_data, contents of the file
+    - directory, uploads folder of the session, where the upload is journaled (the uploads folder of the current session if None)
+    - progress, function called with (pages extracted, total pages) while the first pages are extracted
     output: statement, class object created from file if successfully read
     '''
     try:
-        # read file from uploads directory
-        os.chdir(MASTER_DIRECTORY)
-        text = extract_text(f"{MASTER_DIRECTORY}/data/uploads/{filename}")
-        
-        # if DBS Statement, copy raw file to DBS folder and return statement object
-        if filename.endswith(".pdf") and check_statement(text, ["DBS", MY_NAME, DBS]):
-            filepath = f"{MASTER_DIRECTORY}/data/SG/DBS/{filename}"
-            with open(filepath, 'wb') as f:
-                f.write(bytes_data)
-            statement = DBSStatement(filepath)
-            return statement
+        # read only the first pages from memory, the statement readers then parse the document page by page
+        pages = extract_first_pages(bytes_data = bytes_data, count = DETECT_PAGES, progress = progress) if filename.endswith(".pdf") else []
         
-        # if OCBC Statement, copy raw file to OCBC folder and return statement object
-        elif filename.endswith(".pdf") and check_statement(text, ["OCBC 90.N CARD", MY_NAME, OCBC]):
-            filepath = f"{MASTER_DIRECTORY}/data/SG/OCBC/{filename}"
-            with open(filepath, 'wb') as f:
-                f.write(bytes_data)
-            statement = OCBCStatement(filepath)
-            return statement
-            
-        # if IBKR Statement, save processed dataframe to IBKR folder and return statement object
-        elif filename.startswith(IBKR) and filename.endswith(".csv"):
-            filepath = f"{MASTER_DIRECTORY}/data/uploads/{filename}"
-            statement = IBKRStatement(filepath)
-            df = statement.get_transactions()
-            df.to_csv(f"{MASTER_DIRECTORY}/data/SG/IBKR/{filename}")
-            return statement
-            
-        # if DBS (FD / SRS) Statement, save processed dataframe to relevant folder and return statement object
-        elif filename.endswith(".pdf") and (check_statement(text, ["Supplementary Retirement Scheme", MY_NAME, SRS]) or check_statement(text, ["Fixed Deposit", MY_NAME, FD])):
-            
-            filepath = f"{MASTER_DIRECTORY}/data/SG/FD or SRS/{filename}"
-            with open(filepath, 'wb') as f:
-                f.write(bytes_data)
-            
-            statement1 = SRSStatement(filepath)
-            statement2 = FDStatement(filepath)
-            if statement1:
-                return statement1 # SRS detected only
-            else:
-                return statement2 # auto-appends SRS to FD if detected in statement
-            
-        # if Endowus Statement, save processed dataframe to Endowus folder and return statement object
-        elif filename.startswith("Endowus") and filename.endswith(".pdf") and check_statement(text, ["Endowus", MY_NAME, Endowus]):
-            filepath = f"{MASTER_DIRECTORY}/data/SG/Endowus/{filename}"
-            with open(filepath, 'wb') as f:
-                f.write(bytes_data)
-            statement = EndowusStatement(filepath)
-            return statement
-            
-        # if CPF Statement, save processed dataframe to CPF folder and return statement object
-        elif ("Yearly Statement of Account" in filename) and filename.endswith(".pdf") and check_statement(text, ["CPF", MY_NAME, CPF]):
-            filepath = f"{MASTER_DIRECTORY}/data/SG/CPF/{filename}"
-            with open(filepath, 'wb') as f:
-                f.write(bytes_data)
-            statement = CPFStatement(filepath)
-            return statement
-            
-        # if CDP Statement, save processed dataframe to CDP folder and return statement object
-        elif filename.endswith(".pdf") and check_statement(text, ["CDP", MY_NAME, CDP[-4:]]):
-            filepath = f"{MASTER_DIRECTORY}/data/SG/CDP/{filename}"
-            with open(filepath, 'wb') as f:
-                f.write(bytes_data)
-            statement = CDPStatement(filepath)
-            return statement
-            
-        else:
+        # find the registered reader whose signatures all appear in the first pages of the statement
+        reader = detect_statement(filename, "".join(pages or []))
+        if not reader:
             return False
+        folder = f"{MASTER_DIRECTORY}/data/{reader.folder}"
+        digest = hash_bytes(bytes_data)
+        
+        # write raw file once, to the reader's folder, and return statement object
+        if getattr(reader, "save_raw", True):
+            filepath = f"{folder}/{filename}"
+            journal_upload(directory or staging_directory(), filename, digest, filepath)
+            save_bytes(filepath, bytes_data)
+            # the readers look the file up in the text cache by its hash, without reading it back to hash it
+            remember_digest(filepath, digest)
+            add_file(filepath)
+            return reader(filepath)
+        
+        # otherwise, save processed dataframe to the reader's folder and return statement object
+        statement = reader(io.BytesIO(bytes_data))
+        df = statement.get_transactions()
+        save_csv(df, f"{folder}/{filename}")
+        record_upload(digest, f"{folder}/{filename}")
+        record_statement(f"{folder}/{filename}")
+        return statement
         
     except Exception as e:
         print(e)
-        
 
-def check_statement(text, match_strings):
-    return all([text.find(str) >= 0 for str in match_strings])
+
+def journal_upload(directory, filename, digest, filepath):
+    '''
+    FUNCTION to note an upload in the session's uploads folder until its processed .csv is saved.
+    An entry left behind, e.g. after a crash, names a raw statement written to its folder without a processed .csv.
+    input:
+    - directory, uploads folder of the session
+    - filename, name of the upload
+    - digest, content hash of the upload
+    - filepath, where the raw file is written
+    '''
+    save_json(os.path.join(directory, f"{filename}.json"),
+              {"filename": filename, "digest": digest, "filepath": filepath, "time": time.time()})
+
+
+def release_upload(directory, filename):
+    '''
+    FUNCTION to remove the journal entry of an upload once its processed .csv is saved, keeping the entries of other uploads.
+    input:
+    - directory, uploads folder of the session
+    - filename, name of the upload
+    '''
+    try:
+        os.remove(os.path.join(directory, f"{filename}.json"))
+    except FileNotFoundError:
+        pass
+    remove_session_folder(directory)
+
+
+def remove_session_folder(directory):
+    # a session's folder is removed once nothing is journaled in it, and created again on its next upload
+    if os.path.dirname(os.path.normpath(directory)) == os.path.normpath(UPLOAD_DIRECTORY):
+        try:
+            os.rmdir(directory)
+        except OSError:
+            pass # other uploads of the session are still journaled
+
+
+def interrupted_uploads(directory = UPLOAD_DIRECTORY):
+    '''
+    FUNCTION to list the uploads written to their folder but never saved as a processed .csv, by sessions no longer connected.
+    input: directory, the uploads folder of every session
+    output: list of journal entries, oldest first
+    '''
+    entries = []
+    for root, dirs, files in os.walk(directory):
+        # uploads of a connected session may still be categorized and saved
+        if os.path.dirname(os.path.normpath(root)) == os.path.normpath(directory):
+            if active_session(os.path.basename(root)):
+                continue
+            # folders of disconnected sessions that never journaled an upload, e.g. of a statement that was not recognized
+            if not files and not dirs:
+                remove_session_folder(root)
+                continue
+        for ff in files:
+            entry = load_json(os.path.join(root, ff)) if ff.endswith(".json") else None
+            if entry and os.path.exists(entry["filepath"]):
+                csv = entry["filepath"][:entry["filepath"].rfind(".")] + '.csv'
+                if not os.path.exists(csv):
+                    entries.append(entry)
+    return sorted(entries, key = lambda entry: entry["time"])
 
 
 def completed(df):
@@ -188,21 +203,49 @@ def completed(df):
         print(e)
 
 
-def save_data(df, filename):
+def save_data(df, filepath, directory = None):
     '''
     FUNCTION to save processed data as .csv file in database.
     input:
     - df, the dataframe
-    - filename, the name of the original file
+    - filepath, to the original file of the statement (statement.filepath), in the reader's folder
+    - directory, uploads folder of the session the upload is journaled in (the uploads folder of the current session if None)
     output: N/A
     '''
     try:
-        clear_directory()
-        # find filepath of original file and save csv
-        filelist = list_files(MASTER_DIRECTORY)
-        idx = [ff for ff in filelist if filename in ff]
-        if idx:
-            file = idx[0][:idx[0].rfind(".")] + '.csv'
-            df.to_csv(file)
+        # statements read from memory were saved by process_upload, there is no original file
+        if not isinstance(filepath, str):
+            return
+        # save csv next to the original file
+        file = filepath[:filepath.rfind(".")] + '.csv'
+        # contents of the original file, so a renamed copy is recognized on upload
+        digest = hash_file(filepath)
+        save_csv(df, file)
+        record_upload(digest, file)
+        record_statement(file)
+        release_upload(directory or staging_directory(), os.path.basename(filepath))
+    except Exception as e:
+        print(e)
+
+
+def record_statement(filepath):
+    '''
+    FUNCTION to propagate a newly saved .csv statement to the ledger storage.
+    input: filepath, to the saved .csv file
+    '''
+    try:
+        add_file(filepath)
+        tag, source, file = locate_statement(filepath)
+        # one writer at a time for the ledger, rollup and indexes of a tag, across sessions and processes
+        with locked(f"{MASTER_DIRECTORY}/data/{tag}"):
+            if LEDGER_ENGINE == 'parquet':
+                write_statement(filepath)
+            elif LEDGER_ENGINE == 'sqlite':
+                sync_statement(filepath)
+            update_rollup(filepath, tag)
+            update_search_index(filepath, tag)
+            update_fingerprints(filepath, tag)
+            # invalidate compiled ledgers cached by the app
+            bump_version(tag)
     except Exception as e:
         print(e)
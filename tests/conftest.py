@@ -0,0 +1,37 @@
+import os
+import sys
+import shutil
+import tempfile
+import pandas as pd
+import pytest
+
+# the modules read their settings on import: point them at a scratch data tree
+MASTER_DIRECTORY = tempfile.mkdtemp(prefix = "expense-tracker-tests-")
+os.environ["MASTER_DIRECTORY"] = MASTER_DIRECTORY
+os.environ["CACHE_DIRECTORY"] = ""
+for key, value in {"MY_NAME": "JANE DOE", "DBS": "111-22222-3", "OCBC": "1234", "IBKR": "U1234567",
+                   "Endowus": "E12345", "FD": "FD12345", "SRS": "SRS12345", "CPF": "S1234567A",
+                   "CDP": "0001-2345-6789"}.items():
+    os.environ.setdefault(key, value)
+for folder in ["uploads", "SG", "US"]:
+    os.makedirs(os.path.join(MASTER_DIRECTORY, "data", folder), exist_ok = True)
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+
+@pytest.fixture
+def statements():
+    # an empty data/SG tree, without the indexes built from earlier statements
+    folder = os.path.join(MASTER_DIRECTORY, "data", "SG")
+    shutil.rmtree(folder, ignore_errors = True)
+    for ff in os.listdir(os.path.join(MASTER_DIRECTORY, "data")):
+        if ff.startswith("SG."):
+            path = os.path.join(MASTER_DIRECTORY, "data", ff)
+            shutil.rmtree(path) if os.path.isdir(path) else os.remove(path)
+    os.makedirs(os.path.join(folder, "DBS"))
+    os.makedirs(os.path.join(folder, "OCBC"))
+    yield folder
+
+
+def write_statement(path, rows):
+    pd.DataFrame(rows, columns = ["Date", "Description", "Amount", "Balance", "Category"]).to_csv(path, index = False)
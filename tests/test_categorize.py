@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+import categorize_utilities
+from categorize_utilities import RuleMatcher, categorize
+from constants import expense_categories
+
+
+def ocbc_frame(descriptions, amounts):
+    # as built by read_ocbc: a categorical without Credit Card
+    df = pd.DataFrame({"Date": ["01/01"]*len(amounts), "Description": descriptions, "Amount": amounts})
+    df["Category"] = (df["Amount"].astype("category").cat.remove_categories(df["Amount"])
+                      .cat.add_categories([ex for ex in expense_categories if ex != "Credit Card"]))
+    return df
+
+
+def test_rules_outside_statement_categories_are_skipped(monkeypatch):
+    matcher = RuleMatcher({"ocbc payment": ("Credit Card", 5), "grab": ("Transport", 5)})
+    monkeypatch.setattr(categorize_utilities, "load_models", lambda: (matcher, None))
+    df, confidence = categorize(ocbc_frame(["OCBC PAYMENT", "GRAB RIDE"], [-100.0, -12.5]))
+    assert pd.isna(df.loc[0, "Category"])
+    assert pd.isna(confidence[0])
+    assert df.loc[1, "Category"] == "Transport"
+    assert confidence[1] == 1.0
+
+
+class FixedClassifier:
+    def __init__(self, predictions):
+        self.predictions = predictions
+
+    def predict(self, texts):
+        labels, probs = zip(*[self.predictions[text] for text in texts])
+        return np.array(labels, dtype = object), np.array(probs)
+
+
+def test_only_confident_expenses_are_classified(monkeypatch):
+    classifier = FixedClassifier({"ntuc": ("Groceries", 0.9), "kopi": ("Dining", 0.4), "visa": ("Credit Card", 0.95)})
+    monkeypatch.setattr(categorize_utilities, "load_models", lambda: (RuleMatcher({}), classifier))
+    df, confidence = categorize(ocbc_frame(["NTUC", "KOPI", "VISA", "REFUND"], [-30.0, -4.0, -200.0, 15.0]), threshold = 0.6)
+    assert df.loc[0, "Category"] == "Groceries"
+    # below the threshold: left for the user, with its confidence kept for review
+    assert pd.isna(df.loc[1, "Category"]) and confidence[1] == 0.4
+    # not a category of the statement
+    assert pd.isna(df.loc[2, "Category"])
+    # incoming amounts are not classified
+    assert pd.isna(df.loc[3, "Category"]) and pd.isna(confidence[3])
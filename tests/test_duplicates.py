@@ -0,0 +1,15 @@
+import os
+import pandas as pd
+
+from duplicate_utilities import find_duplicates
+from conftest import write_statement
+
+
+def test_statements_removed_outside_the_app_are_not_duplicates(statements):
+    rows = [["2024-01-05", "NTUC FAIRPRICE", -10.0, 100.0, "Groceries"]]
+    write_statement(f"{statements}/DBS/JAN.csv", rows)
+    new = pd.DataFrame(rows, columns = ["Date", "Description", "Amount", "Balance", "Category"])
+    assert list(find_duplicates(new, "SG/DBS")) == ["DBS/JAN.csv"]
+
+    os.remove(f"{statements}/DBS/JAN.csv")
+    assert list(find_duplicates(new, "SG/DBS")) == [None]
@@ -0,0 +1,68 @@
+import os
+import random
+from datetime import date
+import pandas as pd
+import pytest
+
+import compile_utilities
+from compile_utilities import compile_statements, balance_table
+from rollup_utilities import load_rollup, rollup_balance_table
+from conftest import write_statement
+
+
+def test_rollup_balances_match_balance_table(statements):
+    # balances recorded on the same date, the last one in the statement in a category sorted first
+    write_statement(f"{statements}/DBS/JAN-2024.csv",
+                    [["2024-01-05", "NTUC", -10.0, 100.0, "Groceries"],
+                     ["2024-01-31", "NTUC", -20.0, 80.0, "Groceries"],
+                     ["2024-01-31", "KOPI", -5.0, 75.0, "Dining"],
+                     ["2024-02-29", "SALARY", 500.0, 575.0, None]])
+    write_statement(f"{statements}/OCBC/JAN-2024.csv",
+                    [["2024-01-31", "GRAB", -10.0, 40.0, "Transport"],
+                     ["2024-01-31", "NTUC", -10.0, 30.0, "Groceries"],
+                     ["2024-01-31", "REFUND", 5.0, 35.0, None]])
+    period = (date(2024, 1, 1), date(2024, 2, 29))
+    expected = balance_table(compile_statements("Singapore", period), period)
+    result = rollup_balance_table(load_rollup("Singapore"))
+    pd.testing.assert_frame_equal(result, expected, check_freq = False)
+    assert result.loc["2024-01-31", "DBS"] == 75.0
+
+
+@pytest.mark.parametrize("engine", ["csv", "parquet", "sqlite"])
+def test_rollup_balances_match_balance_table_with_same_date_balances(statements, engine, monkeypatch):
+    # two years of monthly statements per source, several balances on each transaction date
+    rng = random.Random(0)
+    os.makedirs(f"{statements}/UOB")
+    for source in ["DBS", "OCBC", "UOB"]:
+        balance = 1000.0
+        for year in [2023, 2024]:
+            for month in range(1, 13):
+                rows = []
+                for day in sorted(rng.choice([1, 15, 28]) for _ in range(12)):
+                    amount = round(rng.uniform(-50, 50), 2)
+                    balance = round(balance + amount, 2)
+                    rows.append([date(year, month, day).isoformat(), "NTUC", amount, balance,
+                                 rng.choice(["Groceries", "Dining", "Transport", None])])
+                write_statement(f"{statements}/{source}/{year}-{month:02d}.csv", rows)
+
+    monkeypatch.setattr(compile_utilities, "LEDGER_ENGINE", engine)
+    period = (date(2023, 1, 1), date(2024, 12, 31))
+    expected = balance_table(compile_statements("Singapore", period), period)
+    result = rollup_balance_table(load_rollup("Singapore"))
+    pd.testing.assert_frame_equal(result, expected, check_freq = False)
+
+
+def test_rollup_reconciles_statements_modified_outside_the_app(statements):
+    filepath = f"{statements}/DBS/JAN-2024.csv"
+    write_statement(filepath, [["2024-01-05", "NTUC", -10.0, 100.0, "Groceries"]])
+    assert load_rollup("Singapore")["Sum"].sum() == -10.0
+
+    write_statement(filepath, [["2024-01-05", "NTUC", -30.0, 80.0, "Groceries"]])
+    os.utime(filepath, ns = (0, os.stat(filepath).st_mtime_ns + 10**9))
+    write_statement(f"{statements}/OCBC/JAN-2024.csv", [["2024-01-06", "GRAB", -5.0, 20.0, "Transport"]])
+    rollup = load_rollup("Singapore")
+    assert sorted(rollup["File"]) == ["DBS/JAN-2024.csv", "OCBC/JAN-2024.csv"]
+    assert rollup["Sum"].sum() == -35.0
+
+    os.remove(filepath)
+    assert list(load_rollup("Singapore")["File"]) == ["OCBC/JAN-2024.csv"]
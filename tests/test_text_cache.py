@@ -0,0 +1,16 @@
+import os
+
+from pdf_utilities import TextCache
+
+
+def test_disk_tier_keeps_the_most_recently_used_documents(tmp_path):
+    cache = TextCache(maxsize = 0, directory = str(tmp_path), disksize = 2)
+    cache.put("a", ["page a"])
+    cache.put("b", ["page b"])
+    os.utime(tmp_path / "a.json", (1, 1))
+    os.utime(tmp_path / "b.json", (2, 2))
+
+    # reading a document from disk marks it as recently used
+    assert cache.get("a") == ["page a"]
+    cache.put("c", ["page c"])
+    assert sorted(os.listdir(tmp_path)) == ["a.json", "c.json"]
@@ -0,0 +1,28 @@
+import os
+import pandas as pd
+
+from upload_utilities import save_data, journal_upload, release_upload
+from storage_utilities import staging_directory
+
+
+def test_save_data_writes_next_to_the_statement_when_names_collide(statements, tmp_path):
+    # the same file name downloaded from two banks
+    for bank in ["DBS", "OCBC"]:
+        with open(f"{statements}/{bank}/Statement.pdf", 'wb') as f:
+            f.write(bank.encode())
+    df = pd.DataFrame([["2024-01-05", "NTUC FAIRPRICE", -10.0, "Groceries"]], columns = ["Date", "Description", "Amount", "Category"])
+
+    save_data(df, f"{statements}/OCBC/Statement.pdf", str(tmp_path))
+    assert os.path.exists(f"{statements}/OCBC/Statement.csv")
+    assert not os.path.exists(f"{statements}/DBS/Statement.csv")
+
+
+def test_session_folder_is_removed_with_its_last_journal_entry():
+    directory = staging_directory("finished-session")
+    journal_upload(directory, "JAN.pdf", "digest1", "/data/SG/DBS/JAN.pdf")
+    journal_upload(directory, "FEB.pdf", "digest2", "/data/SG/DBS/FEB.pdf")
+
+    release_upload(directory, "JAN.pdf")
+    assert os.listdir(directory) == ["FEB.pdf.json"]
+    release_upload(directory, "FEB.pdf")
+    assert not os.path.exists(directory)